@@ -0,0 +1,125 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from CvPyGui.DataLoader import ChunkedLoader, TIME_COLUMN, ZEROED_TIME_COLUMN
+from CvPyGui.FilterPipeline import applyStagesToColumns, loadChain
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+FORMATS = ('parquet', 'feather', 'npy')
+
+
+def outputPath(path, output_dir, fmt, name=None):
+    if name is None:
+        name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(output_dir, name + ('.' + fmt if fmt != 'npy' else ''))
+
+
+def outputNames(paths):
+    # Output name of each input file: its name without the extension, with
+    # its folder name in front when files of different folders have the same
+    # name, and numbered if that is still not enough
+    names = {path: os.path.splitext(os.path.basename(path))[0] for path in paths}
+    counts = {}
+    for name in names.values():
+        counts[name] = counts.get(name, 0) + 1
+    for path, name in names.items():
+        if counts[name] > 1:
+            folder = os.path.basename(os.path.dirname(os.path.abspath(path)))
+            names[path] = '{}_{}'.format(folder, name) if folder else name
+    taken = set()
+    for path in paths:
+        name, number = names[path], 2
+        while names[path] in taken:
+            names[path] = '{} ({})'.format(name, number)
+            number += 1
+        taken.add(names[path])
+    return names
+
+
+def writeResult(df, target, fmt):
+    if fmt == 'parquet':
+        df.to_parquet(target)
+    elif fmt == 'feather':
+        df.reset_index().to_feather(target)
+    else:
+        # One .npy file per column, plus the zeroed time
+        os.makedirs(target, exist_ok=True)
+        np.save(os.path.join(target, ZEROED_TIME_COLUMN + '.npy'), df.index.to_numpy())
+        for column in df.columns:
+            np.save(os.path.join(target, '{}.npy'.format(str(column).replace(os.sep, '_'))), df[column].to_numpy(),
+                    allow_pickle=False)
+
+
+def processFile(path, stages, output_dir, fmt, columns=None, threads=1, name=None):
+    # Loads a data file the way the GUI does and runs the filter chain on all
+    # numeric channels at once, on `threads` threads. Runs in a worker
+    # process, so it must not need Qt
+    start = time.perf_counter()
+    df = ChunkedLoader(path).load()
+    if columns is None:
+        columns = [column for column in df.columns
+                   if column != TIME_COLUMN and df[column].dtype.kind == 'f']
+    result = applyStagesToColumns(df, stages, columns, threads)
+    target = outputPath(path, output_dir, fmt, name)
+    writeResult(result, target, fmt)
+    return path, target, len(df), time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Apply a saved filter chain to data logger files, without the GUI')
+    parser.add_argument('chain', help='filter chain JSON ([{"name": ..., "params": {...}}, ...])')
+    parser.add_argument('files', nargs='+', help='data logger files')
+    parser.add_argument('-o', '--output-dir', default='filtered')
+    parser.add_argument('-f', '--format', choices=FORMATS,
+                        default='parquet' if pyarrow is not None else 'npy')
+    parser.add_argument('-c', '--columns', nargs='+', default=None,
+                        help='channels to filter (all numeric channels by default)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help='number of worker processes')
+    args = parser.parse_args(argv)
+
+    if args.format != 'npy' and pyarrow is None:
+        parser.error('the {} format needs pyarrow'.format(args.format))
+    try:
+        stages = loadChain(args.chain)
+    except (OSError, ValueError, KeyError, TypeError) as error:
+        # Missing file, malformed JSON, unknown filter or entries that are not
+        # {"name": ..., "params": {...}} objects
+        parser.error('could not read the filter chain {}: {}'.format(args.chain, error))
+    os.makedirs(args.output_dir, exist_ok=True)
+    # Each file once, and never two of them written to the same output
+    files = list(dict.fromkeys(os.path.abspath(path) for path in args.files))
+    names = outputNames(files)
+
+    # With fewer files than worker processes, the cores left over filter the
+    # channels of each file in parallel
+    jobs = max(1, min(args.jobs, len(files)))
+    threads = max(1, args.jobs // jobs)
+    failed = 0
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(processFile, path, stages, args.output_dir, args.format,
+                               args.columns, threads, names[path]): path
+                   for path in files}
+        for future in as_completed(futures):
+            try:
+                path, target, rows, seconds = future.result()
+            except Exception as error:
+                failed += 1
+                print('{}: {}'.format(futures[future], error), file=sys.stderr)
+                continue
+            print('{} -> {} ({} rows, {:.2f} s)'.format(path, target, rows, seconds))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
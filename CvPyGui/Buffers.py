@@ -0,0 +1,46 @@
+import numpy as np
+
+
+class GrowableArray:
+    """1-D array with amortized O(1) appends"""
+
+    def __init__(self, values=None, dtype=np.float64, capacity=0):
+        # Wraps the given values without copying them; they are only copied
+        # the first time the array has to grow
+        if values is not None:
+            self.buffer = np.asarray(values)
+            self.size = len(self.buffer)
+        else:
+            self.buffer = np.empty(capacity, dtype=dtype)
+            self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def dtype(self):
+        return self.buffer.dtype
+
+    @property
+    def nbytes(self):
+        return self.buffer.nbytes
+
+    def view(self):
+        return self.buffer[:self.size]
+
+    def truncate(self, size):
+        self.size = max(0, min(size, self.size))
+
+    def reserve(self, capacity):
+        if capacity <= len(self.buffer) and self.buffer.flags.writeable:
+            return
+        buffer = np.empty(max(capacity, 2 * len(self.buffer), 1024), dtype=self.buffer.dtype)
+        buffer[:self.size] = self.buffer[:self.size]
+        self.buffer = buffer
+
+    def extend(self, values):
+        values = np.asarray(values)
+        end = self.size + len(values)
+        self.reserve(end)
+        self.buffer[self.size:end] = values
+        self.size = end
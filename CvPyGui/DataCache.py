@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from CvPyGui.DataLoader import ZEROED_TIME_COLUMN
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'CVPYGUI_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'CvPyGui'))
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024 * 1024
+META_FILE = 'meta.json'
+INDEX_FILE = 'index.bin'
+
+
+def fileKey(path):
+    # Identifies a version of a data file by its path, size and modification time
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size,
+            'mtime': stat.st_mtime_ns}
+
+
+def keyMatches(key, path):
+    # Whether the file is still the version a key was made from. Keys of
+    # rows read from a file cover its complete lines, so the file may be
+    # longer than the key by a line still being written
+    try:
+        current = fileKey(path)
+    except OSError:
+        return False
+    return (key.get('path') == current['path'] and key.get('mtime') == current['mtime']
+            and key.get('size', -1) <= current['size'])
+
+
+class CacheWriter:
+    """Streams the chunks of a data file into a new cache entry"""
+
+    def __init__(self, cache, path, dtypes):
+        self.cache = cache
+        self.key = fileKey(path)
+        self.entry = cache.entryDir(path)
+        self.tmp = self.entry + '.tmp'
+        shutil.rmtree(self.tmp, ignore_errors=True)
+        os.makedirs(self.tmp)
+
+        # Numeric columns are appended to raw binary files that can be memory
+        # mapped later. Text columns are kept aside and pickled on close
+        self.columns = list(dtypes)
+        self.dtypes = {column: np.dtype(dtype) for column, dtype in dtypes.items()}
+        self.files = ['column{}.{}'.format(number, 'npy' if self.dtypes[column] == object else 'bin')
+                      for number, column in enumerate(self.columns)]
+        self.handles = {}
+        self.objects = {}
+        for column, name in zip(self.columns, self.files):
+            if self.dtypes[column] == object:
+                self.objects[column] = []
+            else:
+                self.handles[column] = open(os.path.join(self.tmp, name), 'wb')
+        self.index = open(os.path.join(self.tmp, INDEX_FILE), 'wb')
+        self.rows = 0
+
+    def append(self, chunk):
+        np.ascontiguousarray(chunk.index.to_numpy(), dtype=np.float64).tofile(self.index)
+        for column, handle in self.handles.items():
+            np.ascontiguousarray(chunk[column].to_numpy(), dtype=self.dtypes[column]).tofile(handle)
+        for column, pieces in self.objects.items():
+            pieces.append(chunk[column].to_numpy())
+        self.rows += len(chunk)
+
+    def closeFiles(self):
+        self.index.close()
+        for handle in self.handles.values():
+            handle.close()
+
+    def close(self, extra=None, key=None):
+        # The entry is written to a temporary directory and only renamed when
+        # complete, so a crash never leaves a half written entry that looks
+        # valid. `extra` holds more values to keep in the metadata. `key` is
+        # the version of the file the rows came from (see ChunkedLoader.key),
+        # by default the one it had when the writer was created
+        self.closeFiles()
+        for column, pieces in self.objects.items():
+            values = np.concatenate(pieces) if pieces else np.array([], dtype=object)
+            np.save(os.path.join(self.tmp, self.files[self.columns.index(column)]),
+                    values, allow_pickle=True)
+
+        size = sum(os.path.getsize(os.path.join(self.tmp, name)) for name in os.listdir(self.tmp))
+        meta = {'key': key or self.key, 'columns': self.columns, 'files': self.files,
+                'dtypes': [self.dtypes[column].str if self.dtypes[column] != object else 'object'
+                           for column in self.columns],
+                'rows': self.rows, 'bytes': size, 'last_used': time.time()}
+        meta.update(extra or {})
+        self.cache.writeMeta(self.tmp, meta)
+
+        shutil.rmtree(self.entry, ignore_errors=True)
+        os.replace(self.tmp, self.entry)
+        self.cache.evict(keep=self.entry)
+        return meta
+
+    def abort(self):
+        self.closeFiles()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+class DataCache:
+    """Sidecar cache of parsed data files, stored as one file per column"""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def entryDir(self, path):
+        name = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name)
+
+    def readMeta(self, entry):
+        try:
+            with open(os.path.join(entry, META_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def writeMeta(self, entry, meta):
+        tmp = os.path.join(entry, META_FILE + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(entry, META_FILE))
+
+    def lookup(self, path):
+        # Returns the metadata of a valid entry for the file, dropping entries
+        # left behind by an older version of it
+        entry = self.entryDir(path)
+        meta = self.readMeta(entry)
+        if meta is None:
+            return None
+        if not (keyMatches(meta['key'], path) and 'dtypes' in meta):
+            self.invalidate(path)
+            return None
+        meta['last_used'] = time.time()
+        self.writeMeta(entry, meta)
+        return meta
+
+    def readArray(self, filename, dtype, rows, mmap_mode=None):
+        if dtype == 'object':
+            return np.load(filename, allow_pickle=True)
+        if mmap_mode is None:
+            return np.fromfile(filename, dtype=dtype, count=rows)
+        if rows == 0:
+            return np.array([], dtype=dtype)
+        return np.memmap(filename, dtype=dtype, mode=mmap_mode, shape=(rows,))
+
+    def loadIndex(self, path, meta, mmap_mode=None):
+        index = self.readArray(os.path.join(self.entryDir(path), INDEX_FILE),
+                               '<f8', meta['rows'], mmap_mode)
+        return pd.Index(index, name=ZEROED_TIME_COLUMN, copy=False)
+
+    def loadColumn(self, path, column, meta=None, index=None, mmap_mode=None):
+        # Reads a single variable without touching the other column files.
+        # With mmap_mode the values are only paged in when they are used
+        if meta is None:
+            meta = self.lookup(path)
+            if meta is None:
+                return None
+        if index is None:
+            index = self.loadIndex(path, meta, mmap_mode)
+        number = meta['columns'].index(column)
+        values = self.readArray(os.path.join(self.entryDir(path), meta['files'][number]),
+                                meta['dtypes'][number], meta['rows'], mmap_mode)
+        return pd.Series(values, index=index, name=column, copy=False)
+
+    def load(self, path, columns=None):
+        meta = self.lookup(path)
+        if meta is None:
+            return None
+        index = self.loadIndex(path, meta)
+        if columns is None:
+            columns = meta['columns']
+        data = {column: self.loadColumn(path, column, meta, index).to_numpy()
+                for column in columns}
+        return pd.DataFrame(data, index=index, columns=columns, copy=False)
+
+    def writer(self, path, dtypes):
+        return CacheWriter(self, path, dtypes)
+
+    def store(self, path, df):
+        writer = self.writer(path, df.dtypes.to_dict())
+        try:
+            writer.append(df)
+        except Exception:
+            writer.abort()
+            raise
+        return writer.close()
+
+    def entries(self):
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            entry = os.path.join(self.directory, name)
+            meta = self.readMeta(entry)
+            if meta is not None:
+                entries.append((entry, meta))
+        return entries
+
+    def evict(self, keep=None):
+        # Removes the least recently used entries until the cache fits in
+        # max_bytes, never removing the entry given in keep
+        entries = sorted(self.entries(), key=lambda item: item[1]['last_used'])
+        entries = [item for item in entries if item[0] != keep]
+        total = sum(meta['bytes'] for _, meta in entries)
+        while entries and total > self.max_bytes:
+            entry, meta = entries.pop(0)
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= meta['bytes']
+
+    def invalidate(self, path):
+        shutil.rmtree(self.entryDir(path), ignore_errors=True)
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Manage the parsed data file cache')
+    parser.add_argument('--clear', action='store_true', help='remove every entry')
+    parser.add_argument('--invalidate', nargs='+', default=[], metavar='FILE',
+                        help='remove the entries of the given data files')
+    args = parser.parse_args()
+
+    cache = DataCache()
+    for path in args.invalidate:
+        cache.invalidate(path)
+    if args.clear:
+        cache.clear()
+    for entry, meta in cache.entries():
+        print('{:>12} bytes  {}'.format(meta['bytes'], meta['key']['path']))
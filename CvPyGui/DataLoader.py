@@ -0,0 +1,178 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Options matching the layout written by the data logger: tab separated, six
+# lines of header before the column names and a line of units right after them
+READ_OPTIONS = dict(delimiter='\t',
+                    na_values=['NaN', 'OutOfRange'],
+                    skiprows=(0, 1, 2, 3, 4, 5, 7))
+
+TIME_COLUMN = 'Tempo'
+ZEROED_TIME_COLUMN = 'Tempo zerado'
+
+# Columns that must keep double precision (time stamps lose resolution as
+# float32 after a few hours of logging)
+FLOAT64_COLUMNS = (TIME_COLUMN,)
+
+# Options for rows appended after the header (see LiveTail.FileFollower)
+ROW_OPTIONS = dict(delimiter='\t', na_values=['NaN', 'OutOfRange'], header=None)
+
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+MIN_CHUNK_ROWS = 1000
+SAMPLE_ROWS = 1000
+
+
+def inferDtypes(path, sample_rows=SAMPLE_ROWS, float32=True):
+    # Reads a small sample of the file and returns an explicit dtype for each
+    # column, using float32 for every numeric column that allows it
+    sample = pd.read_csv(path, nrows=sample_rows, **READ_OPTIONS)
+    dtypes = {}
+    for column in sample.columns:
+        if not pd.api.types.is_numeric_dtype(sample[column]):
+            dtypes[column] = object
+        elif float32 and column not in FLOAT64_COLUMNS:
+            dtypes[column] = np.float32
+        else:
+            dtypes[column] = np.float64
+    return dtypes
+
+
+def estimateChunkRows(path, num_columns, memory_budget=DEFAULT_MEMORY_BUDGET,
+                      sample_rows=SAMPLE_ROWS):
+    # Number of rows per chunk so that the text being parsed plus its float64
+    # intermediate values fit in the memory budget
+    with open(path, 'rb') as f:
+        sample = f.readlines(sample_rows * 256)
+    line_bytes = max(1, sum(len(line) for line in sample) // max(1, len(sample)))
+    row_bytes = 2 * line_bytes + 8 * num_columns
+    return max(MIN_CHUNK_ROWS, memory_budget // row_bytes)
+
+
+def completeLength(f):
+    # Length of the file up to its last complete line, so that a line still
+    # being written by the logger is left for the next read
+    f.seek(0, os.SEEK_END)
+    end = f.tell()
+    while end > 0:
+        start = max(0, end - 65536)
+        f.seek(start)
+        block = f.read(end - start)
+        newline = block.rfind(b'\n')
+        if newline >= 0:
+            return start + newline + 1
+        end = start
+    return 0
+
+
+class BoundedReader:
+    """Binary file object that stops reading at a given offset"""
+
+    def __init__(self, f, limit):
+        self.f = f
+        self.limit = limit
+
+    def read(self, size=-1):
+        remaining = self.limit - self.f.tell()
+        if remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        return self.f.read(size)
+
+    def readline(self, size=-1):
+        remaining = self.limit - self.f.tell()
+        if remaining <= 0:
+            return b''
+        return self.f.readline(remaining if size is None or size < 0 else min(size, remaining))
+
+    def __iter__(self):
+        return iter(self.readline, b'')
+
+    def tell(self):
+        return self.f.tell()
+
+
+class ChunkedLoader:
+    """Streaming reader for the tab separated data logger files"""
+
+    def __init__(self, path, memory_budget=DEFAULT_MEMORY_BUDGET, dtypes=None,
+                 float32=True):
+        if memory_budget is None:
+            memory_budget = DEFAULT_MEMORY_BUDGET
+        self.path = path
+        self.memory_budget = memory_budget
+        self.dtypes = dtypes if dtypes is not None else inferDtypes(path, float32=float32)
+        self.chunk_rows = estimateChunkRows(path, len(self.dtypes), memory_budget)
+        self.cancelled = False
+        # Time of the first row and offset of the end of the last row read,
+        # where following the file (see LiveTail) picks up new rows
+        self.t0 = None
+        self.end_offset = None
+        # Version of the file the rows were read from, as a DataCache key
+        self.key = None
+
+    def cancel(self):
+        self.cancelled = True
+
+    def chunks(self, onProgress=None):
+        # Yields the file as time zeroed DataFrames of at most chunk_rows rows.
+        # onProgress receives the fraction of the file read so far
+        with open(self.path, 'rb') as f:
+            # The modification time is taken before measuring the rows, so
+            # rows appended in between give the file a newer time than the key
+            mtime = os.fstat(f.fileno()).st_mtime_ns
+            self.end_offset = completeLength(f)
+            self.key = {'path': os.path.abspath(self.path), 'size': self.end_offset,
+                        'mtime': mtime}
+            f.seek(0)
+            file_size = max(1, self.end_offset)
+            reader = pd.read_csv(BoundedReader(f, self.end_offset), dtype=self.dtypes,
+                                 chunksize=self.chunk_rows, **READ_OPTIONS)
+            for chunk in reader:
+                if self.cancelled:
+                    return
+                time = chunk[TIME_COLUMN].to_numpy(dtype=np.float64)
+                if self.t0 is None:
+                    self.t0 = time[0]
+                chunk.index = pd.Index(time - self.t0, name=ZEROED_TIME_COLUMN)
+                if onProgress is not None:
+                    onProgress(min(1.0, f.tell() / file_size))
+                yield chunk
+
+    def loadInto(self, writer, onProgress=None, onFirstChunk=None):
+        # Streams the file into a writer (see DataCache.CacheWriter) so only
+        # one chunk is held in memory at a time. Returns False if cancelled
+        first = True
+        for chunk in self.chunks(onProgress):
+            if first and onFirstChunk is not None:
+                onFirstChunk(chunk)
+            first = False
+            writer.append(chunk)
+        return not self.cancelled
+
+    def load(self, onProgress=None, onFirstChunk=None):
+        # Reads the whole file and returns it indexed by the zeroed time.
+        # Columns are gathered as separate arrays and joined one at a time, so
+        # the peak memory is the final frame plus one column and one chunk
+        columns = {column: [] for column in self.dtypes}
+        index = []
+        for chunk in self.chunks(onProgress):
+            if onFirstChunk is not None and not index:
+                onFirstChunk(chunk)
+            index.append(chunk.index.to_numpy())
+            for column in columns:
+                columns[column].append(chunk[column].to_numpy())
+            del chunk
+        if self.cancelled:
+            return None
+
+        data = {}
+        for column in list(columns):
+            pieces = columns.pop(column)
+            data[column] = np.concatenate(pieces) if pieces else np.array([], dtype=self.dtypes[column])
+            del pieces
+        time_index = pd.Index(np.concatenate(index) if index else np.array([]),
+                              name=ZEROED_TIME_COLUMN)
+        return pd.DataFrame(data, index=time_index, copy=False)
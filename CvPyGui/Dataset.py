@@ -0,0 +1,45 @@
+class ColumnDataset:
+    """Data file opened column by column from memory mapped cache files"""
+
+    # Behaves like the DataFrame it replaces for the code reading it: iterating
+    # gives the column names and indexing by name gives a Series over the
+    # zeroed time. A column is only paged in from disk when it is used
+
+    def __init__(self, cache, path, meta):
+        self.cache = cache
+        self.path = path
+        self.meta = meta
+        self.columns = list(meta['columns'])
+        self.index = cache.loadIndex(path, meta, mmap_mode='r')
+        self.opened = {}
+
+    @classmethod
+    def open(cls, cache, path):
+        meta = cache.lookup(path)
+        if meta is None:
+            return None
+        return cls(cache, path, meta)
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    def __getitem__(self, column):
+        if column not in self.opened:
+            if column not in self.columns:
+                raise KeyError(column)
+            self.opened[column] = self.cache.loadColumn(
+                self.path, column, self.meta, self.index, mmap_mode='r')
+        return self.opened[column]
+
+    def release(self, column):
+        # Drops the mapping of a column that is no longer shown
+        self.opened.pop(column, None)
+
+    def toDataFrame(self, columns=None):
+        return self.cache.load(self.path, columns)
@@ -0,0 +1,188 @@
+import numpy as np
+
+from CvPyGui.Buffers import GrowableArray
+
+# Number of samples summarized by each bucket of the finest level, and how
+# many buckets of a level are merged into one bucket of the next level
+BASE_BUCKET = 16
+LEVEL_FACTOR = 4
+
+
+def bucketExtrema(values, indices, size):
+    # For groups of `size` consecutive entries of `indices`, returns the
+    # indices holding the minimum and the maximum of `values`. NaN samples are
+    # ignored unless the whole group is NaN, which then plots as a gap
+    padding = -len(indices) % size
+    if padding and len(indices):
+        indices = np.concatenate([indices, np.repeat(indices[-1:], padding)])
+    groups = indices.reshape(-1, size)
+    grouped = values[groups]
+    nan = np.isnan(grouped)
+    rows = np.arange(len(groups))
+    imin = groups[rows, np.where(nan, np.inf, grouped).argmin(axis=1)]
+    imax = groups[rows, np.where(nan, -np.inf, grouped).argmax(axis=1)]
+    return imin, imax
+
+
+def bucketCover(start, stop, sizes):
+    # Splits the rows [start, stop) into whole buckets of the given sizes
+    # (ascending, each a multiple of the previous one), using the largest
+    # buckets that fit and single rows at the edges. Returns (level, first,
+    # last) ranges of bucket numbers, level -1 being single rows. Only a few
+    # ranges per level are needed, however long the span of rows
+    sizes = [1] + list(sizes)
+    cover = []
+    lo, hi = start, stop
+    for level, size in enumerate(sizes):
+        if lo >= hi:
+            break
+        if level + 1 < len(sizes):
+            coarse = sizes[level + 1]
+            inner_lo = min(hi, -(-lo // coarse) * coarse)
+            inner_hi = max(inner_lo, hi // coarse * coarse)
+        else:
+            inner_lo = inner_hi = hi
+        for first, last in ((lo, inner_lo), (inner_hi, hi)):
+            if first < last:
+                cover.append((level - 1, first // size, last // size))
+        lo, hi = inner_lo, inner_hi
+    return cover
+
+
+class MinMaxPyramid:
+    """Multi-resolution min/max envelopes of a series, for plotting"""
+
+    def __init__(self, x, y, base=BASE_BUCKET, factor=LEVEL_FACTOR):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y)
+        if self.y.dtype.kind != 'f':
+            self.y = self.y.astype(np.float64)
+        self.base = base
+        self.factor = factor
+        # Growable copies of x, y and the levels, created by the first replaceFrom
+        self.buffers = None
+
+        # Each level keeps, for every bucket, the positions of its extremes in
+        # the original series, so spikes are never lost when zooming out
+        self.levels = []
+        if len(self.y) > 2 * base:
+            imin, imax = bucketExtrema(self.y, np.arange(len(self.y)), base)
+            self.levels.append((base, imin, imax))
+            while len(imin) > 2 * factor:
+                mins, _ = bucketExtrema(self.y, imin, factor)
+                _, maxs = bucketExtrema(self.y, imax, factor)
+                imin, imax = mins, maxs
+                self.levels.append((self.levels[-1][0] * factor, imin, imax))
+
+    @classmethod
+    def fromSeries(cls, series):
+        return cls(series.index.to_numpy(), series.to_numpy())
+
+    def __len__(self):
+        return len(self.y)
+
+    def memoryUsage(self):
+        # Bytes of the levels, plus the copies of x and y made by replaceFrom
+        total = sum(imin.nbytes + imax.nbytes for _, imin, imax in self.levels)
+        if self.buffers is not None:
+            xs, ys, _ = self.buffers
+            total += xs.nbytes + ys.nbytes
+        return total
+
+    def xRange(self):
+        if not len(self.x):
+            return 0.0, 1.0
+        return self.x[0], self.x[-1]
+
+    def replaceFrom(self, position, x, y):
+        # Replaces the samples from `position` on (appending when position is
+        # the current length), recomputing only the buckets they fall in
+        if self.buffers is None:
+            self.buffers = (GrowableArray(self.x), GrowableArray(self.y),
+                            [(GrowableArray(imin), GrowableArray(imax)) for _, imin, imax in self.levels])
+        xs, ys, levels = self.buffers
+        position = min(position, len(ys))
+        for buffer, values in ((xs, x), (ys, y)):
+            buffer.truncate(position)
+            buffer.extend(values)
+        self.x, self.y = xs.view(), ys.view()
+
+        if not levels and len(self.y) > 2 * self.base:
+            levels.append((GrowableArray(dtype=np.intp), GrowableArray(dtype=np.intp)))
+            position = 0
+
+        first = position // self.base
+        for number, (mins, maxs) in enumerate(levels):
+            if number == 0:
+                indices = np.arange(first * self.base, len(self.y))
+                new_mins, new_maxs = bucketExtrema(self.y, indices, self.base)
+            else:
+                lower_mins, lower_maxs = levels[number - 1]
+                start = first * self.factor
+                new_mins, _ = bucketExtrema(self.y, lower_mins.view()[start:], self.factor)
+                _, new_maxs = bucketExtrema(self.y, lower_maxs.view()[start:], self.factor)
+            mins.truncate(first)
+            mins.extend(new_mins)
+            maxs.truncate(first)
+            maxs.extend(new_maxs)
+            first //= self.factor
+
+        while levels and len(levels[-1][0]) > 2 * self.factor:
+            top_mins, top_maxs = levels[-1]
+            new_mins, _ = bucketExtrema(self.y, top_mins.view(), self.factor)
+            _, new_maxs = bucketExtrema(self.y, top_maxs.view(), self.factor)
+            levels.append((GrowableArray(new_mins), GrowableArray(new_maxs)))
+
+        self.levels = [(self.base * self.factor ** number, mins.view(), maxs.view())
+                       for number, (mins, maxs) in enumerate(levels)]
+
+    def extrema(self, start, stop):
+        # Positions of the minimum and the maximum of rows [start, stop), taken
+        # from the extremes of the buckets covering them, so the cost grows
+        # with the number of levels and not with the number of rows
+        mins, maxs = [], []
+        for level, first, last in bucketCover(start, stop, [bucket for bucket, _, _ in self.levels]):
+            if level < 0:
+                rows = np.arange(first, last)
+                mins.append(rows)
+                maxs.append(rows)
+            else:
+                _, imin, imax = self.levels[level]
+                mins.append(imin[first:last])
+                maxs.append(imax[first:last])
+        if not mins:
+            return None, None
+        mins = np.concatenate(mins)
+        maxs = np.concatenate(maxs)
+        values = self.y[mins]
+        imin = mins[np.where(np.isnan(values), np.inf, values).argmin()]
+        values = self.y[maxs]
+        imax = maxs[np.where(np.isnan(values), -np.inf, values).argmax()]
+        return imin, imax
+
+    def decimate(self, xmin, xmax, pixels):
+        # Returns at most about 2 * pixels points drawing the same envelope as
+        # the samples between xmin and xmax (plus one sample on each side so
+        # the line reaches the border of the axes)
+        start = max(0, np.searchsorted(self.x, xmin, side='left') - 1)
+        stop = min(len(self.x), np.searchsorted(self.x, xmax, side='right') + 1)
+        count = stop - start
+        pixels = max(1, int(pixels))
+
+        level = None
+        for bucket, imin, imax in self.levels:
+            if bucket * pixels <= count:
+                level = (bucket, imin, imax)
+        if level is None:
+            return self.x[start:stop], self.y[start:stop]
+
+        bucket, imin, imax = level
+        first = start // bucket
+        last = -(-stop // bucket)
+        imin = imin[first:last]
+        imax = imax[first:last]
+        # Each bucket contributes its two extremes in the order they happen
+        indices = np.empty(2 * len(imin), dtype=imin.dtype)
+        indices[0::2] = np.minimum(imin, imax)
+        indices[1::2] = np.maximum(imin, imax)
+        return self.x[indices], self.y[indices]
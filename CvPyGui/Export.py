@@ -0,0 +1,135 @@
+import os
+from collections import OrderedDict
+
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# Rows converted and written at a time, so exporting holds at most one chunk
+# besides the data being exported
+EXPORT_CHUNK_ROWS = 1000000
+
+# Export format of each file extension
+EXPORT_FORMATS = OrderedDict([
+    ('.parquet', 'parquet'),
+    ('.feather', 'feather'),
+    ('.h5', 'hdf5'),
+    ('.hdf5', 'hdf5'),
+    ('.csv', 'csv'),
+])
+EXPORT_FILTER = ';;'.join([
+    'Parquet (*.parquet)', 'Feather (*.feather)', 'HDF5 (*.h5 *.hdf5)', 'CSV (*.csv)'])
+
+
+def exportFormat(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in EXPORT_FORMATS:
+        raise ValueError('Unknown export format {!r}; use one of {}'.format(
+            extension, ', '.join(EXPORT_FORMATS)))
+    return EXPORT_FORMATS[extension]
+
+
+def chunks(df, rows=EXPORT_CHUNK_ROWS):
+    for start in range(0, len(df), rows):
+        yield start, df.iloc[start:start + rows]
+
+
+def seriesFrame(series_list):
+    # One DataFrame over the columns of several series without copying them,
+    # when they share their time index (the plots of one data file do)
+    index = series_list[0].index
+    names = []
+    for series in series_list:
+        name = str(series.name)
+        while name in names:
+            name += "'"
+        names.append(name)
+    if all(series.index.equals(index) for series in series_list[1:]):
+        return pd.DataFrame({name: series.to_numpy() for name, series in zip(names, series_list)},
+                            index=index, copy=False)
+    return pd.concat(series_list, axis=1, keys=names)
+
+
+def writeCsv(df, path, onProgress=None, rows=EXPORT_CHUNK_ROWS):
+    with open(path, 'w', newline='') as f:
+        for start, chunk in chunks(df, rows):
+            chunk.to_csv(f, header=start == 0)
+            if onProgress is not None:
+                onProgress(min(1.0, (start + len(chunk)) / len(df)))
+
+
+def arrowTables(df, onProgress=None, rows=EXPORT_CHUNK_ROWS):
+    if pyarrow is None:
+        raise ImportError('Exporting to parquet and feather needs pyarrow')
+    for start, chunk in chunks(df, rows):
+        yield pyarrow.Table.from_pandas(chunk, preserve_index=True)
+        if onProgress is not None:
+            onProgress(min(1.0, (start + len(chunk)) / len(df)))
+
+
+def writeParquet(df, path, onProgress=None, rows=EXPORT_CHUNK_ROWS):
+    # One row group per chunk
+    import pyarrow.parquet
+
+    writer = None
+    try:
+        for table in arrowTables(df, onProgress, rows):
+            if writer is None:
+                writer = pyarrow.parquet.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def writeFeather(df, path, onProgress=None, rows=EXPORT_CHUNK_ROWS):
+    # Feather version 2 is the Arrow IPC file format, written batch by batch
+    import pyarrow.ipc
+
+    writer = None
+    try:
+        for table in arrowTables(df, onProgress, rows):
+            if writer is None:
+                writer = pyarrow.ipc.new_file(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def writeHdf5(df, path, onProgress=None, rows=EXPORT_CHUNK_ROWS):
+    # Appended to a table under the key 'data' (needs PyTables)
+    with pd.HDFStore(path, mode='w') as store:
+        for start, chunk in chunks(df, rows):
+            store.append('data', chunk, index=False)
+            if onProgress is not None:
+                onProgress(min(1.0, (start + len(chunk)) / len(df)))
+
+
+WRITERS = {
+    'parquet': writeParquet,
+    'feather': writeFeather,
+    'hdf5': writeHdf5,
+    'csv': writeCsv,
+}
+
+
+def exportData(data, path, onProgress=None, rows=EXPORT_CHUNK_ROWS):
+    # Writes a DataFrame, a Series or a list of Series (as columns) in the
+    # format of the file extension, streamed by chunks of rows. A file left
+    # by a failed export is removed
+    if isinstance(data, pd.Series):
+        data = data.to_frame()
+    elif isinstance(data, (list, tuple)):
+        data = seriesFrame(data)
+    writer = WRITERS[exportFormat(path)]
+    try:
+        writer(data, path, onProgress, rows)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return len(data)
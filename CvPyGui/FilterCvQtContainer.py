@@ -7,6 +7,8 @@ class Filter(QWidget):
     """Common base class for all filters"""
     defaultK = 3
     filterCount = 0
+    # Kernel sizes must be odd; other parameters (thresholds) take any value
+    odd_only = True
 
     def __init__(self, name, minValue, maxValue, init, num_of_k, parent=None):
         super().__init__()
@@ -39,8 +41,10 @@ class Filter(QWidget):
         # Adds the slider and it's label to the layout
         self.createLayout()
 
-        # Function sending the slider signal to the processing function
+        # Function sending the slider signal to the processing function. While
+        # dragging only a preview is computed; releasing asks for the full data
         self.thresh_sld.valueChanged.connect(self.changeValue)
+        self.thresh_sld.sliderReleased.connect(self.process)
 
     def setParameters(self, minValue, maxValue):
         # Creates the slider for the OpenCV filter, with min, max, default and
@@ -63,30 +67,33 @@ class Filter(QWidget):
     def changeValue(self, value):
         # Function for setting the value of k1
 
-        if value % 2 == 1:
-            self.k[0] = value
-        else:
-            self.k[0] = value + 1
+        if self.odd_only and value % 2 == 0:
+            value = value + 1
+        if value == self.k[0] and value == self.thresh_sld.value():
+            return
+        self.k[0] = value
 
+        # Moving the slider to the odd value must not emit valueChanged again
+        self.thresh_sld.blockSignals(True)
         self.thresh_sld.setValue(self.k[0])
+        self.thresh_sld.blockSignals(False)
         self.k_lbl[0].setText(str(self.k[0]))
-        self.process()
+        self.process(preview=self.thresh_sld.isSliderDown())
 
     def resetValue(self):
         # Resets the K value to it's default
         self.changeValue(self.defaultK)
 
     def deleteFilter(self):
-        self.parent().parent().deleteFilter(self.filter_number)
-
-    def process(self):
-
-        k = self.k[0]
-
-        if self.name == 'Moving Average':
-            self.filtered_df = self.parent().variable_df.rolling(window=int(k), center=True).median().fillna(method='ffill').fillna(method='bfill')
-            self.parent().variable_df = self.filtered_df
-            self.parent().updatePlot()
-        elif self.name == 'Set maximum':
-            pass
-        return
\ No newline at end of file
+        # The widget holding the filter (a plot or an image filter chain)
+        # removes it from its chain
+        self.parent().deleteFilter(self.filter_number)
+
+    def stage(self):
+        # Name and parameters of this filter as a stage of the plot pipeline
+        return self.name, {'k': self.k[0]}
+
+    def process(self, preview=False):
+        # The plot reruns its pipeline from the raw series at most once per
+        # frame; stages before this one are taken from the cache
+        self.parent().scheduleFilters(preview)
@@ -0,0 +1,356 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from CvPyGui import Resampling
+from CvPyGui.Profiling import TIMINGS
+from CvPyGui.RollingStats import rollingMedian
+
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+
+
+def movingMedian(series, k, out=None):
+    return pd.Series(rollingMedian(series.to_numpy(), k, out=out), index=series.index,
+                     name=series.name, copy=False)
+
+
+def passthrough(series, out=None, **params):
+    return series
+
+
+def decimateSeries(series, k, out=None):
+    # Keeps one sample out of k, low-pass filtered against aliasing
+    k = int(k)
+    if k <= 1 or not len(series):
+        return series
+    values = Resampling.decimate(series.to_numpy(), k, out=out)
+    return pd.Series(values, index=series.index[::k], name=series.name, copy=False)
+
+
+def bucketResampler(reduce):
+    # Filter resampling a series onto a time grid of buckets k samples wide
+    # (at the usual sample rate), aligned on time 0 so the grid is the same
+    # for every channel and file
+    def resample(series, k, out=None):
+        if int(k) <= 1 or len(series) < 2:
+            return series
+        times = series.index.to_numpy(dtype=np.float64)
+        width = Resampling.bucketWidth(times, int(k))
+        if width <= 0:
+            return series
+        starts, centers = Resampling.buckets(times, width)
+        values = reduce(series.to_numpy(), starts, out=out)
+        return pd.Series(values, index=pd.Index(centers, name=series.index.name),
+                         name=series.name, copy=False)
+    return resample
+
+
+def savgolSeries(series, k, out=None):
+    if int(k) <= Resampling.SAVGOL_ORDER or not len(series):
+        return series
+    return pd.Series(Resampling.savgol(series.to_numpy(), int(k), out=out),
+                     index=series.index, name=series.name, copy=False)
+
+
+def butterworthSeries(series, k, out=None):
+    if int(k) <= 2 or len(series) < 2:
+        return series
+    return pd.Series(Resampling.butterworth(series.to_numpy(), int(k), out=out),
+                     index=series.index, name=series.name, copy=False)
+
+
+def blockMovingMedian(block, k):
+    return rollingMedian(block, k)
+
+
+# Functions applying each filter type to a series, by the name shown in the GUI.
+# They take an optional `out` array (of the series' float dtype) that they may
+# write their result into instead of allocating a new one. The resampling
+# filters return fewer samples than they are given, at new times; placed
+# first in a chain they cut the work of the next stages and of the plot
+FILTERS = {
+    'Moving Average': movingMedian,
+    'Set maximum': passthrough,
+    'Decimate': decimateSeries,
+    'Bucket mean': bucketResampler(Resampling.bucketMean),
+    'Bucket max': bucketResampler(Resampling.bucketMax),
+    'Savitzky-Golay': savgolSeries,
+}
+if Resampling.HAVE_SCIPY:
+    FILTERS['Butterworth'] = butterworthSeries
+
+# The same filters applied to a 2-D float array, one channel per column. Filters
+# missing here are applied to each column through FILTERS
+BLOCK_FILTERS = {
+    'Moving Average': blockMovingMedian,
+    'Set maximum': passthrough,
+}
+
+# Slider minimum, maximum and initial value of each filter in the plots, and
+# whether the value must be odd (window sizes)
+FILTER_PARAMETERS = {
+    'Moving Average': (3, 30, 5, True),
+    'Set maximum': (0, 1000, 100, False),
+    # Decimation factor and bucket width, in samples
+    'Decimate': (2, 100, 10, False),
+    'Bucket mean': (2, 1000, 10, False),
+    'Bucket max': (2, 1000, 10, False),
+    # Window of the fitted polynomials, in samples
+    'Savitzky-Golay': (5, 101, 11, True),
+    # Shortest period passed, in samples
+    'Butterworth': (3, 200, 20, False),
+}
+
+# Filters that are a centered rolling statistic over a window of 'k' samples
+WINDOW_STATISTICS = {
+    'Moving Average': 'median',
+}
+
+
+def applyStages(series, stages):
+    # Runs the (name, params) stages without any caching
+    for name, params in stages:
+        series = FILTERS[name](series, **params)
+    return series
+
+
+def applyStagesToBlock(block, stages, index=None):
+    # Runs the stages on every column of a 2-D float array. Returns the
+    # filtered array and its index, which the resampling stages change
+    for name, params in stages:
+        if name in BLOCK_FILTERS:
+            block = BLOCK_FILTERS[name](block, **params)
+        else:
+            columns = [FILTERS[name](pd.Series(block[:, column], index=index), **params)
+                       for column in range(block.shape[1])]
+            block = np.column_stack([column.to_numpy() for column in columns])
+            index = columns[0].index
+    return block, index
+
+
+def applyStagesToColumns(data, stages, columns=None, threads=None):
+    # Applies the stages to many channels of a DataFrame (or ColumnDataset) at
+    # once. Channels of the same dtype are copied into one Fortran ordered
+    # array, so each channel is contiguous, and groups of channels are filtered
+    # on `threads` threads (the rolling kernels release the GIL). Returns the
+    # filtered channels as a DataFrame with the same index (the index of the
+    # resampled series when the stages resample)
+    if columns is None:
+        columns = [column for column in data if data[column].dtype.kind in 'fiu']
+    if not columns:
+        return pd.DataFrame()
+    if threads is None:
+        threads = os.cpu_count() or 1
+    index = data[columns[0]].index
+
+    groups = OrderedDict()
+    for column in columns:
+        dtype = data[column].dtype
+        groups.setdefault(dtype if dtype.kind == 'f' else np.dtype(np.float64), []).append(column)
+
+    results = {}
+    filtered_index = index
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for dtype, names in groups.items():
+            block = np.empty((len(index), len(names)), dtype=dtype, order='F')
+            for number, column in enumerate(names):
+                block[:, number] = data[column].to_numpy()
+            bounds = np.linspace(0, len(names), min(threads, len(names)) + 1).astype(int)
+            parts = pool.map(lambda bound: applyStagesToBlock(block[:, bound[0]:bound[1]], stages, index),
+                             zip(bounds[:-1], bounds[1:]))
+            first = 0
+            for part, filtered_index in parts:
+                for number in range(part.shape[1]):
+                    results[names[first + number]] = part[:, number]
+                first += part.shape[1]
+            del block
+    return pd.DataFrame({column: results[column] for column in columns}, index=filtered_index,
+                        copy=False)
+
+
+def chainToJson(stages):
+    # Filter chains are saved as a JSON list of {"name": ..., "params": {...}}
+    return [{'name': name, 'params': params} for name, params in stages]
+
+
+def chainFromJson(chain, source='the chain'):
+    stages = [(stage['name'], stage.get('params', {})) for stage in chain]
+    for name, _ in stages:
+        if name not in FILTERS:
+            raise ValueError('Unknown filter {!r} in {}'.format(name, source))
+    return stages
+
+
+def saveChain(path, stages):
+    with open(path, 'w') as f:
+        json.dump(chainToJson(stages), f, indent=2)
+
+
+def loadChain(path):
+    with open(path) as f:
+        return chainFromJson(json.load(f), path)
+
+
+def previewStages(stages, step):
+    # Stages for a series keeping one sample out of `step`, with windows
+    # scaled so they span about the same time as on the full series
+    scaled = []
+    for name, params in stages:
+        params = dict(params)
+        if 'k' in params:
+            params['k'] = max(1, int(params['k']) // step) | 1
+        scaled.append((name, params))
+    return scaled
+
+
+def seriesHash(series):
+    # Content hash of the values and the index of a series (or of an array)
+    digest = hashlib.blake2b(digest_size=16)
+    arrays = (series.index.to_numpy(), series.to_numpy()) if hasattr(series, 'index') else (series,)
+    for values in arrays:
+        values = np.ascontiguousarray(values)
+        digest.update(str(values.dtype).encode())
+        digest.update(values.view(np.uint8) if values.dtype != object else repr(list(values)).encode())
+    return digest.hexdigest()
+
+
+def stageKey(input_key, name, params):
+    return (input_key, name, tuple(sorted(params.items())))
+
+
+def dataBytes(data):
+    if isinstance(data, np.ndarray):
+        return data.nbytes
+    return data.memory_usage(index=False)
+
+
+class FilterPipeline:
+    """Ordered filter stages applied to a raw series, with memoized outputs"""
+
+    # The stages are looked up in `filters`, FILTERS by default. With another
+    # registry the raw data can be any array (see ImagePipeline)
+
+    def __init__(self, cache_bytes=DEFAULT_CACHE_BYTES, lean=False, filters=None):
+        self.filters = FILTERS if filters is None else filters
+        self.raw = None
+        self.raw_key = None
+        self.cache_bytes = cache_bytes
+        self.cache = OrderedDict()
+        self.cached_bytes = 0
+        self.lock = threading.Lock()
+        # In lean mode nothing is memoized and each stage writes into output
+        # arrays kept from the previous runs (see outputBuffer)
+        self.lean = lean
+        # Mode asked by setLean, switched to by the next run
+        self.pending_lean = None
+        self.buffers = {}
+        self.displayed = None
+        self.run_lock = threading.Lock()
+
+    def setRaw(self, series):
+        # Outputs computed for another series can never be hit again
+        with self.lock:
+            self.raw = series
+            self.raw_key = seriesHash(series)
+            self.cache.clear()
+            self.cached_bytes = 0
+
+    def setLean(self, lean):
+        # Called from the GUI thread, which must not wait for a run in
+        # progress: the next run makes the switch (see applyLean)
+        with self.lock:
+            self.pending_lean = lean
+
+    def applyLean(self):
+        # Runs on the worker thread. A run still going in the old mode only
+        # writes buffers or outputs that are no longer kept (see store)
+        with self.lock:
+            if self.pending_lean is None:
+                return
+            self.lean, self.pending_lean = self.pending_lean, None
+            self.cache.clear()
+            self.cached_bytes = 0
+            self.buffers.clear()
+
+    def setDisplayed(self, values):
+        # The array being plotted, whose buffer must not be written by the
+        # next runs
+        self.displayed = values
+
+    def memoryUsage(self):
+        # Bytes of the memoized outputs and the output buffers
+        with self.lock:
+            return self.cached_bytes + sum(buffer.nbytes for slots in self.buffers.values()
+                                           for buffer in slots)
+
+    def run(self, stages):
+        # Applies the (name, params) stages in order. The output of each stage
+        # is cached under the key of its input plus its own parameters, so a
+        # change to stage N recomputes only stages N onward and going back to
+        # earlier parameters is a cache hit. Returns the output and its key
+        self.applyLean()
+        if self.lean:
+            return self.runLean(stages)
+        with self.lock:
+            data, key = self.raw, self.raw_key
+        for name, params in stages:
+            key = stageKey(key, name, params)
+            cached = self.lookup(key)
+            if cached is None:
+                with TIMINGS.timed('filter[{}]'.format(name)):
+                    cached = self.filters[name](data, **params)
+                if cached is not data:
+                    self.store(key, cached)
+            data = cached
+        return data, key
+
+    def runLean(self, stages):
+        # Runs every stage into the reused buffers. Runs are serialized, as a
+        # run superseded by a newer one may still be writing its buffers
+        with self.run_lock:
+            with self.lock:
+                data, key = self.raw, self.raw_key
+            for position, (name, params) in enumerate(stages):
+                key = stageKey(key, name, params)
+                with TIMINGS.timed('filter[{}]'.format(name)):
+                    data = self.filters[name](data, out=self.outputBuffer(position, data), **params)
+            return data, key
+
+    def outputBuffer(self, position, data):
+        # Each stage keeps at most two buffers of the size of its input: while
+        # the result in one of them is plotted, the next run writes the other
+        dtype = data.dtype if data.dtype.kind == 'f' else np.dtype(np.float64)
+        with self.lock:
+            slots = [buffer for buffer in self.buffers.get(position, [])
+                     if buffer.shape == data.shape and buffer.dtype == dtype]
+            for buffer in slots:
+                if self.displayed is None or not np.may_share_memory(buffer, self.displayed):
+                    return buffer
+            buffer = np.empty(data.shape, dtype=dtype)
+            self.buffers[position] = slots[-1:] + [buffer]
+            return buffer
+
+    def lookup(self, key):
+        with self.lock:
+            data = self.cache.get(key)
+            if data is not None:
+                self.cache.move_to_end(key)
+            return data
+
+    def store(self, key, data):
+        # Keeps the most recently used outputs within cache_bytes
+        size = dataBytes(data)
+        with self.lock:
+            if self.lean or key in self.cache or size > self.cache_bytes:
+                return
+            self.cache[key] = data
+            self.cached_bytes += size
+            while self.cached_bytes > self.cache_bytes:
+                _, old = self.cache.popitem(last=False)
+                self.cached_bytes -= dataBytes(old)
@@ -0,0 +1,136 @@
+import threading
+import weakref
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from PyQt5.QtGui import QImage, QPixmap
+
+# Buffers kept for each display size, and display sizes kept (the labels of a
+# window usually share one size; resizing the window adds new ones)
+POOL_BUFFERS = 8
+POOL_SIZES = 4
+
+
+def toQImage(image):
+    # QImage sharing the memory of a uint8 gray, BGR or BGRA image. The rows
+    # must be contiguous (the row stride may be larger, as in a crop) and the
+    # array must outlive the QImage
+    height, width = image.shape[:2]
+    if image.strides[-1] != 1 or (image.ndim == 3 and image.strides[1] != image.shape[2]):
+        raise ValueError('The rows of the image are not contiguous')
+    if image.ndim == 2:
+        return QImage(image.data, width, height, image.strides[0], QImage.Format_Grayscale8)
+    if image.shape[2] == 4:
+        # BGRA bytes are the native layout of Format_RGB32 on little endian
+        # machines, which QPixmap takes without a conversion
+        return QImage(image.data, width, height, image.strides[0], QImage.Format_RGB32)
+    return QImage(image.data, width, height, image.strides[0], QImage.Format_BGR888)
+
+
+def fitSize(shape, size):
+    # Largest (width, height) with the aspect of the image that fits in size
+    height, width = shape[:2]
+    scale = min(size[0] / width, size[1] / height)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+class FramePool:
+    """Preallocated uint8 buffers, handed out again once they are released"""
+
+    def __init__(self, buffers=POOL_BUFFERS, sizes=POOL_SIZES):
+        self.buffers = buffers
+        self.sizes = sizes
+        self.lock = threading.Lock()
+        self.free = OrderedDict()
+        self.allocated = 0
+
+    def acquire(self, shape):
+        with self.lock:
+            free = self.free.get(shape)
+            if free:
+                self.free.move_to_end(shape)
+                return free.pop()
+            self.allocated += 1
+        return np.empty(shape, dtype=np.uint8)
+
+    def release(self, buffer):
+        with self.lock:
+            free = self.free.get(buffer.shape)
+            if free is None:
+                free = self.free[buffer.shape] = []
+                while len(self.free) > self.sizes:
+                    self.free.popitem(last=False)
+            if len(free) < self.buffers:
+                free.append(buffer)
+
+
+class DisplayFrame:
+    """BGRA pixels at the size they are shown at, and a QImage sharing them"""
+
+    # Neither the QImage nor the pixmaps made from it (on the raster backend
+    # QPixmap.fromImage shares the memory) own the pixels, so the frame keeps
+    # them alive and gives them back to the pool only when nothing refers to
+    # it anymore, including frames dropped unseen. A label showing the frame
+    # must keep it (see setLabelFrame)
+
+    def __init__(self, pixels, pool=None):
+        self.pixels = pixels
+        self.image = toQImage(pixels)
+        if pool is not None:
+            weakref.finalize(self, pool.release, pixels)
+
+    def size(self):
+        return self.pixels.shape[1], self.pixels.shape[0]
+
+    def pixmap(self):
+        # GUI thread only
+        return QPixmap.fromImage(self.image)
+
+
+def setLabelFrame(label, frame):
+    # Shows a display frame in a QLabel, which keeps it until it shows the
+    # next one, when the buffer of this one goes back to the pool
+    label.setPixmap(frame.pixmap())
+    label.display_frame = frame
+
+
+class FrameAdapter:
+    """Makes display frames of images, on any thread, from a pool of buffers"""
+
+    # Scaling and the conversion to BGRA run where the image is made (a
+    # worker), into reused buffers, so the GUI thread only wraps a frame of
+    # the size of the label whatever the size of the image
+
+    def __init__(self, pool=None):
+        self.pool = pool or FramePool()
+
+    def prepare(self, image, size):
+        # Display frame of a uint8 gray, BGR or BGRA image fitted in size
+        # (width, height), keeping its aspect
+        width, height = fitSize(image.shape, size)
+        temporary = []
+        if width * 2 <= image.shape[1]:
+            # Sampled at twice the size and averaged by 2 x 2 blocks, so the
+            # pixels read depend on the label and not on the image
+            sampled = self.pool.acquire((height * 2, width * 2) + image.shape[2:])
+            image = cv2.resize(image, (width * 2, height * 2), dst=sampled,
+                               interpolation=cv2.INTER_NEAREST)
+            temporary.append(sampled)
+        if (width, height) != (image.shape[1], image.shape[0]):
+            # Bilinear for enlarging and for shrinking by less than 2, where
+            # it does not alias and is several times faster than area
+            scaled = self.pool.acquire((height, width) + image.shape[2:])
+            image = cv2.resize(image, (width, height), dst=scaled,
+                               interpolation=cv2.INTER_AREA if temporary else cv2.INTER_LINEAR)
+            temporary.append(scaled)
+        pixels = self.pool.acquire((height, width, 4))
+        if image.ndim == 2:
+            cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA, dst=pixels)
+        elif image.shape[2] == 3:
+            cv2.cvtColor(image, cv2.COLOR_BGR2BGRA, dst=pixels)
+        else:
+            np.copyto(pixels, image)
+        for buffer in temporary:
+            self.pool.release(buffer)
+        return DisplayFrame(pixels, self.pool)
@@ -0,0 +1,132 @@
+import cv2
+import numpy as np
+
+# Largest side of the downscaled copy filtered while a slider is dragged
+PREVIEW_SIDE = 640
+
+
+def toGray(image):
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
+def gaussianBlur(image, k, out=None):
+    return cv2.GaussianBlur(image, (k, k), 0, dst=out)
+
+
+def medianBlur(image, k, out=None):
+    return cv2.medianBlur(image, k, dst=out)
+
+
+def threshold(image, k, out=None):
+    _, binary = cv2.threshold(toGray(image), k, 255, cv2.THRESH_BINARY, dst=out)
+    return binary
+
+
+def morphology(operation):
+    def apply(image, k, out=None):
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (k, k))
+        return cv2.morphologyEx(image, operation, kernel, dst=out)
+    return apply
+
+
+# cv2 operations applied to an image by the image workspace, by the name shown
+# in its filter list. Like FilterPipeline.FILTERS they take the slider value
+# as 'k' and an optional output array
+IMAGE_FILTERS = {
+    'Gaussian blur': gaussianBlur,
+    'Median blur': medianBlur,
+    'Threshold': threshold,
+    'Erode': morphology(cv2.MORPH_ERODE),
+    'Dilate': morphology(cv2.MORPH_DILATE),
+    'Opening': morphology(cv2.MORPH_OPEN),
+    'Closing': morphology(cv2.MORPH_CLOSE),
+}
+
+# Slider minimum, maximum and initial value of each filter, and whether the
+# value must be odd (kernel sizes)
+IMAGE_FILTER_PARAMETERS = {
+    'Gaussian blur': (1, 51, 5, True),
+    'Median blur': (1, 31, 5, True),
+    'Threshold': (0, 255, 127, False),
+    'Erode': (1, 31, 3, True),
+    'Dilate': (1, 31, 3, True),
+    'Opening': (1, 31, 5, True),
+    'Closing': (1, 31, 5, True),
+}
+
+# Pixels beyond a tile that a filter reads, in kernel radii (k // 2). Used to
+# size the halo of the tiles (see Tiles.chainHalo)
+IMAGE_FILTER_HALOS = {
+    'Gaussian blur': 1,
+    'Median blur': 1,
+    'Threshold': 0,
+    'Erode': 1,
+    'Dilate': 1,
+    'Opening': 2,
+    'Closing': 2,
+}
+
+
+def loadImage(path):
+    # cv2.imread does not read paths with non ASCII characters on Windows
+    image = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise IOError('Could not read the image {}'.format(path))
+    return image
+
+
+def saveImage(path, image):
+    extension = path[path.rfind('.'):] if '.' in path else '.png'
+    ok, encoded = cv2.imencode(extension, image)
+    if not ok:
+        raise IOError('Could not encode the image as {}'.format(extension))
+    encoded.tofile(path)
+
+
+def previewScale(shape, side=PREVIEW_SIDE):
+    return min(1.0, side / max(shape[:2]))
+
+
+def downscale(image, scale):
+    if scale >= 1.0:
+        return image
+    height, width = image.shape[:2]
+    size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def previewImageStages(stages, scale):
+    # Stages for a copy of the image downscaled by `scale`, with the kernels
+    # scaled so they cover about the same part of the image
+    scaled = []
+    for name, params in stages:
+        params = dict(params)
+        if IMAGE_FILTER_PARAMETERS[name][3]:
+            params['k'] = max(1, int(round(params['k'] * scale))) | 1
+        scaled.append((name, params))
+    return scaled
+
+
+def drawContours(processed, original):
+    # Outlines of the white regions of the processed image (binarized with
+    # Otsu's threshold unless it already is binary) drawn over the original
+    gray = toGray(processed)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    canvas = original.copy() if original.ndim == 3 else cv2.cvtColor(original, cv2.COLOR_GRAY2BGR)
+    thickness = max(1, int(round(max(canvas.shape[:2]) / 500)))
+    cv2.drawContours(canvas, contours, -1, (0, 255, 0), thickness)
+    return canvas, len(contours)
+
+
+def applyImageStages(image, stages, contours=False):
+    # Runs the stages without any caching (see FilterPipeline for the cached
+    # version used by the workspace)
+    processed = image
+    for name, params in stages:
+        processed = IMAGE_FILTERS[name](processed, **params)
+    if contours:
+        processed, _ = drawContours(processed, image)
+    return processed
@@ -0,0 +1,491 @@
+import os
+import time
+
+import numpy as np
+from PyQt5.QtCore import QEvent, Qt, QTimer, pyqtSignal
+from PyQt5.QtWidgets import QFileDialog, QInputDialog, QMainWindow, QVBoxLayout, QWidget
+
+from CvPyGui.FilterCvQtContainer import Filter
+from CvPyGui.FilterPipeline import FilterPipeline
+from CvPyGui.FrameDisplay import FrameAdapter, setLabelFrame
+from CvPyGui.ImagePipeline import (IMAGE_FILTERS, IMAGE_FILTER_PARAMETERS, downscale,
+                                   drawContours, loadImage, previewImageStages,
+                                   previewScale, saveImage)
+from CvPyGui.Profiling import TIMINGS
+from CvPyGui.Tiles import TILED_PIXELS, ImagePyramid, processRegion, processTiled
+from CvPyGui.VideoStream import VideoStream
+from CvPyGui.Workers import WorkerPool, reportError
+from CvPyGui.ui import gui
+
+Ui_MainWindow = gui.Ui_MainWindow
+
+
+class FilterChain(QWidget):
+    """Column of Filter widgets making an image processing chain"""
+
+    # Emitted when a filter is added, changed or removed; True while a slider
+    # is being dragged
+    changed = pyqtSignal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.filters = []
+        self.filtersLayout = QVBoxLayout(self)
+        self.filtersLayout.setContentsMargins(0, 0, 0, 0)
+
+    def addFilter(self, name):
+        minimum, maximum, initial, odd_only = IMAGE_FILTER_PARAMETERS[name]
+        filter = Filter(name, minimum, maximum, initial, 1)
+        filter.odd_only = odd_only
+        filter.defaultK = initial
+        if not odd_only:
+            filter.thresh_sld.setSingleStep(1)
+        self.filtersLayout.addWidget(filter)
+        self.filters.append(filter)
+        filter.resetValue()
+        self.changed.emit(False)
+        return filter
+
+    def stages(self):
+        return [filter.stage() for filter in self.filters]
+
+    def scheduleFilters(self, preview=False):
+        self.changed.emit(preview)
+
+    def deleteFilter(self, filter_number):
+        for filter in self.filters:
+            if filter.filter_number == filter_number:
+                self.filters.remove(filter)
+                self.filtersLayout.removeWidget(filter)
+                filter.deleteLater()
+                self.changed.emit(False)
+                return
+
+
+class ImageWorkspace(QMainWindow, Ui_MainWindow):
+    """Chain of OpenCV filters applied to an image, on the old image form"""
+
+    # Like the plots, filter changes are coalesced to one run per frame, and
+    # while a slider is dragged only a downscaled copy of the image is filtered
+    frame_interval = 16
+    # Images of TILED_PIXELS or more are shown from a cached pyramid and only
+    # the part in view is filtered, at the level matching the zoom. The wheel
+    # zooms by zoom_step and the view never gets narrower than min_view pixels
+    zoom_step = 1.25
+    min_view = 64
+    # Seconds between updates of the frame rate and latencies of a video
+    video_status_interval = 0.5
+
+    # Emitted from the processing thread of a video stream
+    frameReady = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setupUi(self)
+        self.workers = WorkerPool(self)
+        self.path = None
+        self.original = None
+        self.preview = None
+        self.preview_scale = 1.0
+        self.processed = None
+        self.pyramid = None
+        self.view = None
+        self.drag_start = None
+        self.stream = None
+        self.status_time = 0.0
+        # Images are scaled to the labels on the workers (see FrameDisplay)
+        self.adapter = FrameAdapter()
+        self.display_sizes = None
+        self.pipeline = FilterPipeline(filters=IMAGE_FILTERS)
+        self.preview_pipeline = FilterPipeline(filters=IMAGE_FILTERS)
+
+        self.pending_preview = False
+        self.scheduler = QTimer(self)
+        self.scheduler.setSingleShot(True)
+        self.scheduler.setInterval(self.frame_interval)
+        self.scheduler.timeout.connect(lambda: self.processImage(self.pending_preview))
+
+        self.chain = FilterChain()
+        self.v_filters_lay.addWidget(self.chain)
+        self.chain.changed.connect(self.scheduleFilters)
+        self.frameReady.connect(self.showFrame)
+        self.initUI()
+
+    def initUI(self):
+        self.original_frame_lbl.setText('Open an image')
+        self.processed_frame_lbl.setText('')
+        self.filter_select.addItems(list(IMAGE_FILTERS))
+        self.add_filter_btn.clicked.connect(
+            lambda: self.chain.addFilter(self.filter_select.currentText()))
+        self.countours_check_box.toggled.connect(lambda checked: self.scheduleFilters())
+        self.actionOpen_image.triggered.connect(self.openImageDialog)
+        self.actionOpen_video.triggered.connect(self.openVideoDialog)
+        self.actionOpen_camera.triggered.connect(self.openCameraDialog)
+        self.actionStop_video.triggered.connect(self.stopVideo)
+        self.actionSave_original_image.triggered.connect(lambda: self.saveImageDialog(self.original))
+        self.actionSave_processed_image.triggered.connect(self.saveProcessedDialog)
+        self.actionExit.triggered.connect(self.close)
+        for label in (self.original_frame_lbl, self.processed_frame_lbl):
+            label.installEventFilter(self)
+
+    def openImageDialog(self):
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, 'Open image', 'Desktop', 'Image (*.png *.jpg *.jpeg *.bmp *.tif *.tiff *.npy)')
+        if file_path:
+            self.openImage(file_path)
+
+    def openImage(self, path):
+        # Decodes the image and makes its preview copy on a worker thread.
+        # Large images get their pyramid built (or reopened) in the cache
+        self.stopVideo()
+        self.path = path
+
+        size = self.labelSize(self.original_frame_lbl)
+
+        def load(job):
+            pyramid = ImagePyramid.cached(path)
+            if pyramid is None:
+                image = np.load(path, mmap_mode='r') if path.endswith('.npy') else loadImage(path)
+                if image.shape[0] * image.shape[1] >= TILED_PIXELS:
+                    pyramid = ImagePyramid.open(path, image=image, onProgress=job.reportProgress)
+            if pyramid is not None:
+                return pyramid.levels[0], pyramid.top(), 1.0, pyramid, None
+            image = np.array(image)
+            scale = previewScale(image.shape)
+            preview = downscale(image, scale)
+            self.pipeline.setRaw(image)
+            self.preview_pipeline.setRaw(preview)
+            return image, preview, scale, None, self.adapter.prepare(
+                self.displaySource(image, preview, size), size)
+
+        self.statusbar.showMessage('Loading {}'.format(path))
+        self.workers.submit('load', load, onResult=self.imageLoaded, onError=self.jobFailed,
+                            onProgress=lambda fraction: self.statusbar.showMessage(
+                                'Building the pyramid of {}: {:.0%}'.format(path, fraction)))
+
+    def imageLoaded(self, result):
+        self.original, self.preview, self.preview_scale, self.pyramid, display = result
+        self.processed = None
+        height, width = self.original.shape[:2]
+        message = '{}: {} x {}'.format(self.path, width, height)
+        if self.pyramid is not None:
+            self.view = (0, 0, width, height)
+            message += ', tiled ({} levels). Wheel to zoom, drag to pan'.format(len(self.pyramid.levels))
+        self.statusbar.showMessage(message)
+        if display is not None:
+            self.setDisplay(self.original_frame_lbl, display)
+        self.processImage()
+
+    def labelSize(self, label):
+        return max(1, label.width()), max(1, label.height())
+
+    def displaySource(self, original, preview, size):
+        # The preview copy when it is at least as large as the label, so the
+        # scaling reads fewer pixels
+        if preview is not None and (preview.shape[1] >= size[0] or preview.shape[0] >= size[1]):
+            return preview
+        return original
+
+    def showOriginal(self):
+        # Scales the original image to its label on a worker
+        original, preview = self.original, self.preview
+        size = self.labelSize(self.original_frame_lbl)
+
+        def prepare(job):
+            return None, True, [(self.original_frame_lbl, self.adapter.prepare(
+                self.displaySource(original, preview, size), size))]
+
+        self.workers.submit('display', prepare, onResult=self.imageProcessed, onError=self.jobFailed)
+
+    def scheduleFilters(self, preview=False):
+        # A full resolution request wins over previews asked in the same frame.
+        # A running video takes the new chain from its next frame on
+        if self.stream is not None:
+            self.stream.stages = self.chain.stages()
+            self.stream.contours = self.countours_check_box.isChecked()
+            return
+        if self.scheduler.isActive():
+            self.pending_preview = self.pending_preview and preview
+        else:
+            self.pending_preview = preview
+            self.scheduler.start()
+
+    def processImage(self, preview=False):
+        # A new request supersedes the one still running. The stages already
+        # computed with the same parameters are taken from the pipeline cache
+        if self.original is None or self.stream is not None:
+            return
+        if self.pyramid is not None:
+            self.processView(preview)
+            return
+        stages = self.chain.stages()
+        contours = self.countours_check_box.isChecked()
+        if preview and self.preview_scale < 1.0:
+            pipeline, original = self.preview_pipeline, self.preview
+            stages = previewImageStages(stages, self.preview_scale)
+        else:
+            pipeline, original = self.pipeline, self.original
+            preview = False
+        label = self.processed_frame_lbl
+        size = self.labelSize(label)
+
+        def run(job):
+            image, _ = pipeline.run(stages)
+            if contours:
+                image, _ = drawContours(image, original)
+            return image, preview, [(label, self.adapter.prepare(image, size))]
+
+        self.workers.submit('process', run, onResult=self.imageProcessed, onError=self.jobFailed)
+
+    def viewLevel(self, preview=False):
+        # Pyramid level with about one pixel per screen pixel for the view, one
+        # coarser while zooming or panning
+        x0, y0, x1, y1 = self.view
+        label = self.processed_frame_lbl
+        level = self.pyramid.levelFor(max((x1 - x0) / max(1, label.width()),
+                                          (y1 - y0) / max(1, label.height())))
+        if preview:
+            level = min(level + 1, len(self.pyramid.levels) - 1)
+        return level
+
+    def processView(self, preview=False):
+        # Filters the part of the image in view, read from the pyramid level
+        # matching the zoom, so the cost depends on the label size and not on
+        # the image size. The kernels are scaled to the level
+        level = self.viewLevel(preview)
+        scale = 2 ** level
+        x0, y0, x1, y1 = self.view
+        bounds = (y0 // scale, -(-y1 // scale), x0 // scale, -(-x1 // scale))
+        image = self.pyramid.levels[level]
+        stages = previewImageStages(self.chain.stages(), 1.0 / scale)
+        contours = self.countours_check_box.isChecked()
+        labels = (self.original_frame_lbl, self.processed_frame_lbl)
+        sizes = [self.labelSize(label) for label in labels]
+
+        def run(job):
+            original = image[bounds[0]:bounds[1], bounds[2]:bounds[3]]
+            processed = processRegion(image, stages, *bounds)
+            if contours:
+                processed, _ = drawContours(processed, original)
+            return processed, True, [(label, self.adapter.prepare(shown, size)) for label, shown, size
+                                     in zip(labels, (original, processed), sizes)]
+
+        self.workers.submit('process', run, onResult=self.imageProcessed, onError=self.jobFailed)
+
+    def setView(self, x0, y0, width, height):
+        # Keeps the view inside the image and at least min_view pixels wide
+        image_height, image_width = self.original.shape[:2]
+        width = int(min(image_width, max(self.min_view, width)))
+        height = int(min(image_height, max(self.min_view, height)))
+        x0 = int(min(max(0, x0), image_width - width))
+        y0 = int(min(max(0, y0), image_height - height))
+        self.view = (x0, y0, x0 + width, y0 + height)
+
+    def viewScale(self, label):
+        # Screen pixels per image pixel of the view as shown in the label
+        x0, y0, x1, y1 = self.view
+        return min(label.width() / (x1 - x0), label.height() / (y1 - y0))
+
+    def imagePoint(self, label, position):
+        # Image pixel under a point of a label (the view is centered in it)
+        x0, y0, x1, y1 = self.view
+        scale = self.viewScale(label)
+        left = (label.width() - (x1 - x0) * scale) / 2
+        top = (label.height() - (y1 - y0) * scale) / 2
+        return x0 + (position.x() - left) / scale, y0 + (position.y() - top) / scale
+
+    def eventFilter(self, watched, event):
+        # Wheel zoom around the pointer and drag to pan, in tiled mode
+        if self.pyramid is None:
+            return super().eventFilter(watched, event)
+        kind = event.type()
+        x0, y0, x1, y1 = self.view
+        if kind == QEvent.Wheel:
+            factor = 1 / self.zoom_step if event.angleDelta().y() > 0 else self.zoom_step
+            x, y = self.imagePoint(watched, event.pos())
+            self.setView(x - (x - x0) * factor, y - (y - y0) * factor,
+                         (x1 - x0) * factor, (y1 - y0) * factor)
+            self.scheduleFilters()
+            return True
+        if kind == QEvent.MouseButtonPress and event.button() == Qt.LeftButton:
+            self.drag_start = (event.pos(), self.view)
+            return True
+        if kind == QEvent.MouseMove and self.drag_start is not None:
+            position, (start_x, start_y, start_x1, start_y1) = self.drag_start
+            scale = self.viewScale(watched)
+            self.setView(start_x - (event.pos().x() - position.x()) / scale,
+                         start_y - (event.pos().y() - position.y()) / scale,
+                         start_x1 - start_x, start_y1 - start_y)
+            self.scheduleFilters(True)
+            return True
+        if kind == QEvent.MouseButtonRelease and self.drag_start is not None:
+            self.drag_start = None
+            self.scheduleFilters()
+            return True
+        return super().eventFilter(watched, event)
+
+    def imageProcessed(self, result):
+        image, preview, displays = result
+        if not preview:
+            self.processed = image
+        for label, display in displays:
+            self.setDisplay(label, display)
+
+    def setDisplay(self, label, display):
+        # The display frame is already at the label size and in the pixel
+        # format of pixmaps, so nothing is copied or scaled here
+        with TIMINGS.timed('show'):
+            setLabelFrame(label, display)
+
+    def resizeEvent(self, event):
+        # Images are shown at the label size, so they are scaled again
+        super().resizeEvent(event)
+        self.display_sizes = (self.labelSize(self.original_frame_lbl),
+                              self.labelSize(self.processed_frame_lbl))
+        if self.original is not None and self.stream is None:
+            if self.pyramid is None:
+                self.showOriginal()
+            self.scheduleFilters()
+
+    def saveImageDialog(self, image):
+        if image is None:
+            self.statusbar.showMessage('Nothing to save yet')
+            return
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, 'Save image', 'Desktop', 'Image (*.png *.jpg *.bmp *.tif)')
+        if not file_path:
+            return
+
+        # Encoded on the worker, as in tiled mode the original is the whole
+        # memory mapped level 0
+        def save(job):
+            saveImage(file_path, image)
+            return file_path
+
+        self.statusbar.showMessage('Saving {}'.format(file_path))
+        self.workers.submit('save', save,
+                            onResult=lambda path: self.statusbar.showMessage('Saved {}'.format(path)),
+                            onError=lambda message: self.saveFailed(file_path, message))
+
+    def saveProcessedDialog(self):
+        # In tiled mode the whole image is filtered tile by tile into a memory
+        # mapped scratch file in the cache and then encoded (without contours,
+        # which are only drawn on the view)
+        if self.pyramid is None:
+            self.saveImageDialog(self.processed)
+            return
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, 'Save image', 'Desktop', 'Image (*.png *.jpg *.bmp *.tif)')
+        if not file_path:
+            return
+        image = self.original
+        stages = self.chain.stages()
+        scratch = os.path.join(ImagePyramid.entryDir(self.path), 'processed.npy')
+
+        def save(job):
+            sample = processRegion(image, stages, 0, 1, 0, 1)
+            out = np.lib.format.open_memmap(scratch, mode='w+', dtype=sample.dtype,
+                                            shape=image.shape[:2] + sample.shape[2:])
+            try:
+                processTiled(image, stages, out, onProgress=job.reportProgress)
+                saveImage(file_path, out)
+            finally:
+                del out
+                os.remove(scratch)
+            return file_path
+
+        self.statusbar.showMessage('Saving {}'.format(file_path))
+        self.workers.submit('save', save,
+                            onResult=lambda path: self.statusbar.showMessage('Saved {}'.format(path)),
+                            onError=lambda message: self.saveFailed(file_path, message),
+                            onProgress=lambda fraction: self.statusbar.showMessage(
+                                'Saving {}: {:.0%}'.format(file_path, fraction)))
+
+    def openVideoDialog(self):
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, 'Open video', 'Desktop', 'Video (*.avi *.mp4 *.mkv *.mov *.mpg *.webm)')
+        if file_path:
+            self.openVideo(file_path)
+
+    def openCameraDialog(self):
+        index, ok = QInputDialog.getInt(self, 'Open camera', 'Camera number', 0, 0, 16)
+        if ok:
+            self.openVideo(index)
+
+    def openVideo(self, source):
+        # Plays a video file (at its frame rate) or a camera through the chain
+        self.stopVideo()
+        self.scheduler.stop()
+        self.workers.cancel('process')
+        self.path = str(source)
+        self.pyramid = None
+        stream = VideoStream(source, self.chain.stages(), self.countours_check_box.isChecked(),
+                             onResult=self.frameReady.emit, prepare=self.prepareFrame)
+        try:
+            stream.start()
+        except IOError as error:
+            self.statusbar.showMessage(str(error))
+            return
+        self.stream = stream
+        self.original = self.processed = None
+        self.statusbar.showMessage('Playing {}'.format(source))
+
+    def prepareFrame(self, frame, image):
+        # Runs on the processing thread of the stream. display_sizes is
+        # replaced as a whole on resize, so it is read once
+        original_size, processed_size = self.display_sizes or (
+            self.labelSize(self.original_frame_lbl), self.labelSize(self.processed_frame_lbl))
+        return self.adapter.prepare(frame, original_size), self.adapter.prepare(image, processed_size)
+
+    def showFrame(self):
+        # Shows the latest result; frames filtered while the GUI was busy
+        # were replaced in the slot and are never drawn
+        stream = self.stream
+        if stream is None:
+            return
+        result = stream.results.tryTake()
+        if result is not None:
+            self.original, self.processed, (original, processed) = result
+            self.setDisplay(self.original_frame_lbl, original)
+            self.setDisplay(self.processed_frame_lbl, processed)
+        now = time.perf_counter()
+        if now - self.status_time >= self.video_status_interval:
+            self.status_time = now
+            self.showVideoStatus()
+        if stream.finished and result is None:
+            self.stopVideo()
+
+    def showVideoStatus(self):
+        # Frame rate, dropped frames and the mean of the last durations of
+        # every stage
+        stream = self.stream
+        skipped, not_shown = stream.dropped()
+        means = {name: mean for name, last, mean, worst, runs in stream.timings.summary()}
+        latency = means.pop('latency', 0.0)
+        stages = ', '.join('{} {:.1f} ms'.format(name, mean * 1000) for name, mean in means.items())
+        self.statusbar.showMessage(
+            '{:.1f} fps, {} of {} frames dropped ({} not shown), latency {:.1f} ms | {}'.format(
+                stream.fps(), skipped, stream.captured, not_shown, latency * 1000, stages))
+
+    def stopVideo(self):
+        # The last frame stays as the current image
+        if self.stream is None:
+            return
+        stream, self.stream = self.stream, None
+        stream.stop()
+        if self.original is not None:
+            self.preview, self.preview_scale = self.original, 1.0
+            self.pipeline.setRaw(self.original)
+        self.statusbar.showMessage('Stopped {} after {} frames, {} dropped'.format(
+            self.path, stream.captured, stream.dropped()[0]))
+
+    def jobFailed(self, message):
+        reportError(self.statusbar, 'Could not process {}'.format(self.path), message)
+
+    def saveFailed(self, file_path, message):
+        reportError(self.statusbar, 'Could not save {}'.format(file_path), message)
+
+    def closeEvent(self, event):
+        self.stopVideo()
+        self.workers.cancelAll()
+        super().closeEvent(event)
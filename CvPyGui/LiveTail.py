@@ -0,0 +1,110 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from CvPyGui.DataLoader import ROW_OPTIONS, TIME_COLUMN, ZEROED_TIME_COLUMN
+from CvPyGui.FilterPipeline import FILTERS, WINDOW_STATISTICS, passthrough
+from CvPyGui.RollingStats import trailing
+
+
+class FileFollower:
+    """Parses the rows appended to a data file since it was last read"""
+
+    def __init__(self, path, dtypes, t0, offset):
+        self.path = path
+        self.columns = list(dtypes)
+        self.dtypes = dtypes
+        self.t0 = t0
+        self.offset = offset
+
+    @classmethod
+    def fromMeta(cls, path, meta):
+        # Follower for a file opened from the cache (see DataCache.lookup)
+        dtypes = {column: object if dtype == 'object' else np.dtype(dtype)
+                  for column, dtype in zip(meta['columns'], meta['dtypes'])}
+        return cls(path, dtypes, meta.get('t0'), meta.get('end_offset'))
+
+    @classmethod
+    def fromLoader(cls, loader):
+        return cls(loader.path, loader.dtypes, loader.t0, loader.end_offset)
+
+    def readNew(self):
+        # Returns the complete rows written after the last read, indexed by the
+        # zeroed time, or None when there are none. Only the new bytes are read
+        if self.offset is None:
+            return None
+        size = os.path.getsize(self.path)
+        if size < self.offset:
+            raise IOError('{} was truncated while being followed'.format(self.path))
+        if size == self.offset:
+            return None
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        end = data.rfind(b'\n')
+        if end < 0:
+            return None
+        self.offset += end + 1
+
+        rows = pd.read_csv(io.BytesIO(data[:end + 1]), names=self.columns,
+                           dtype=self.dtypes, **ROW_OPTIONS)
+        time = rows[TIME_COLUMN].to_numpy(dtype=np.float64)
+        if self.t0 is None and len(time):
+            self.t0 = time[0]
+        rows.index = pd.Index(time - self.t0, name=ZEROED_TIME_COLUMN)
+        return rows
+
+
+class StreamingStage:
+    """Filter stage fed in blocks, carrying its window across block boundaries"""
+
+    def __init__(self, name, params):
+        self.statistic = WINDOW_STATISTICS.get(name)
+        if self.statistic is None and FILTERS[name] is not passthrough:
+            raise ValueError('{} can not be applied incrementally'.format(name))
+        self.k = int(params.get('k', 1)) if self.statistic is not None else 1
+        # Samples after the center of a window: the output lags the input by them
+        self.after = (self.k - 1) // 2
+        self.carry = None
+        self.last_valid = np.nan
+
+    def push(self, values, position):
+        # Takes the input samples starting at `position` and returns the
+        # position and values of the outputs whose window is now complete
+        if self.k == 1:
+            return position, values
+        if self.carry is not None:
+            position -= len(self.carry)
+            values = np.concatenate([self.carry, values])
+        self.carry = values[-(self.k - 1):]
+        if len(values) < self.k:
+            return position, values[:0]
+
+        out = trailing(values, self.k, self.statistic)[self.k - 1:]
+        # Windows holding NaN samples take the last valid output, like the
+        # ffill applied after the full filter
+        nan = np.isnan(out)
+        if nan.any():
+            out = pd.Series(np.concatenate([[self.last_valid], out])).ffill().to_numpy(dtype=out.dtype)[1:]
+        if len(out) and not np.isnan(out[-1]):
+            self.last_valid = out[-1]
+        return position + self.k - 1 - self.after, out
+
+
+class StreamingPipeline:
+    """Filter stages applied incrementally to samples appended to a series"""
+
+    def __init__(self, stages):
+        self.stages = [StreamingStage(name, params) for name, params in stages]
+        # Samples needed before new data so every stage has full windows
+        self.warmup = sum(stage.k - 1 for stage in self.stages) + 1
+
+    def push(self, values, position):
+        # Returns the position of the first output and the outputs. They may
+        # start before `position`, replacing values near the end of the series
+        # that were computed with incomplete windows
+        for stage in self.stages:
+            position, values = stage.push(values, position)
+        return position, values
@@ -1,46 +1,548 @@
-import pandas as pd
-import numpy as np
-from PyQt5.QtWidgets import (QMainWindow, QApplication, QFileDialog)
+import os
+import time
+from contextlib import ExitStack
 
-from CvPyGui import FilterCvQtContainer
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QMainWindow, QFileDialog, QLabel
+
+from CvPyGui.Dataset import ColumnDataset
+from CvPyGui.Profiling import CAPTURE, TIMINGS
+from CvPyGui.Startup import importDeferred
+from CvPyGui.Workers import LOG, WorkerPool, reportError
 from CvPyGui.ui import gui3
 
-from matplotlib.backends.backend_qt4agg import NavigationToolbar2QT as NavigationToolbar
-from matplotlib.backends.backend_qt4agg import FigureCanvasQTAgg as FigureCanvas
+# numpy, pandas and matplotlib are imported where they are first needed, so
+# the window shows up without waiting for them (see Startup.DEFERRED_MODULES)
 
 Ui_MainWindow = gui3.Ui_MainWindow
 
 class MyApp(QMainWindow, Ui_MainWindow):
 
     filter_count = 0
-    plots = []
+    # Memory allowed for the chunks being parsed while loading a data file
+    # (None for DataLoader.DEFAULT_MEMORY_BUDGET)
+    memory_budget = None
+    # Whether the data channels are loaded as float32 (the time stays float64)
+    float32 = True
+    # How often a followed data file is checked for new rows, in ms
+    follow_interval = 500
+    # How often the timings are refreshed, and the time a frame may take on
+    # the GUI thread (ms)
+    timings_interval = 500
+    frame_budget = 16
 
     def __init__(self):
         super().__init__()
         QMainWindow.__init__(self)
         Ui_MainWindow.__init__(self)
+        self.workers = WorkerPool(self)
+        self.cache = None
+        self.registry = None
+        self.follower = None
+        self.follow_timer = QTimer(self)
+        self.follow_timer.setInterval(self.follow_interval)
+        self.follow_timer.timeout.connect(self.pollFile)
+        self.timings_timer = QTimer(self)
+        self.timings_timer.setInterval(self.timings_interval)
+        self.timings_timer.timeout.connect(self.updateTimings)
         self.setupUi(self)
+        self.plots = self.plotManager.plots
         self.initUI()
-
-        self.plots.append(self.plot1)
-        self.plots.append(self.plot2)
-        self.plots.append(self.plot3)
+        # The data modules are imported in the background while the user looks
+        # at the window, before the first file is opened
+        QTimer.singleShot(0, lambda: self.workers.submit('import', importDeferred))
 
     def initUI(self):
 
-        self.toolbar = NavigationToolbar(self.plot1.canvas, self)
-        self.addToolBar(self.toolbar)
+        # The toolbar is attached to the first plot once its canvas exists
+        self.toolbar = None
+        self.plotManager.canvasCreated.connect(self.attachToolbar)
+        # Values under the cursor stay on the right of the status bar, next to
+        # the messages
+        self.readoutLabel = QLabel()
+        self.statusbar.addPermanentWidget(self.readoutLabel)
+        self.timingsLabel = QLabel()
+        self.timingsLabel.hide()
+        self.statusbar.addPermanentWidget(self.timingsLabel)
+        self.plotManager.cursorReadout.connect(self.showReadout)
+        self.plotManager.regionStatistics.connect(self.showRegionStatistics)
+        self.addPlotButton.clicked.connect(self.addPlot)
         self.actionLoad_data.triggered.connect(self.LoadDataFile)
+        self.actionCompare_file.triggered.connect(self.compareDataFileDialog)
+        self.actionClose_compared.triggered.connect(self.closeComparedFiles)
+        self.actionClear_cache.triggered.connect(self.clearCache)
+        self.actionFollow_file.toggled.connect(self.toggleFollow)
+        self.actionFilter_all.triggered.connect(self.filterAllChannels)
+        self.actionImage_workspace.triggered.connect(self.openImageWorkspace)
+        self.actionExport_plots.triggered.connect(self.exportPlots)
+        self.actionExport_channels.triggered.connect(self.exportChannels)
+        self.actionOpen_session.triggered.connect(self.openSessionDialog)
+        self.actionSave_session.triggered.connect(self.saveSessionDialog)
+        self.actionLean_mode.toggled.connect(self.setLean)
+        self.actionSingle_precision.toggled.connect(self.setSinglePrecision)
+        self.actionShow_timings.toggled.connect(self.toggleTimings)
+        self.actionProfile.toggled.connect(self.toggleProfile)
+
+    def attachToolbar(self, plot):
+        if self.toolbar is None and plot is self.plots[0]:
+            from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
+            self.toolbar = NavigationToolbar(plot.canvas, self)
+            self.addToolBar(self.toolbar)
+
+    def addPlot(self):
+        plot = self.plotManager.addPlot()
+        plot.setLean(self.actionLean_mode.isChecked())
+        if hasattr(self, 'original_df'):
+            plot.comboLoadVariable.addItems(list(self.plotData()))
+            plot.connectButtons()
+        return plot
+
+    def showReadout(self, t, readout):
+        if not readout:
+            self.readoutLabel.clear()
+            return
+        self.readoutLabel.setText('t = {:.4f} s    '.format(t) + '    '.join(
+            '{}: {:.6g}'.format(variable, value) for variable, _, value in readout))
+
+    def showRegionStatistics(self, tmin, tmax, statistics):
+        self.statusbar.showMessage('{:.4f} to {:.4f} s    '.format(tmin, tmax) + '    '.join(
+            '{}: n={count} mean={mean:.6g} std={std:.6g} min={min:.6g} max={max:.6g}'.format(
+                variable, **region) for variable, region in statistics))
 
     def LoadDataFile(self):
         # Function for selecting the original image
         filter = "Data file (*.csv, *.txt)"
         file_path, _ = QFileDialog.getOpenFileName(
             self, 'Open image', 'Desktop', filter)
-        self.path = file_path
-        self.original_df = pd.read_csv(self.path, sep='.', delimiter='\t', na_values=['NaN', 'OutOfRange'], skiprows=(0,1,2,3,4,5,7))
-        self.original_df['Tempo zerado'] = self.original_df['Tempo'] - self.original_df['Tempo'][0]
-        self.original_df = self.original_df.set_index('Tempo zerado')
+        if not file_path:
+            return
+        self.stopFollowing()
+        self.openDataFile(file_path)
+
+    def dataCache(self):
+        if self.cache is None:
+            from CvPyGui.DataCache import DataCache
+            self.cache = DataCache()
+        return self.cache
+
+    def dataRegistry(self):
+        if self.registry is None:
+            from CvPyGui.Registry import DatasetRegistry
+            self.registry = DatasetRegistry()
+        return self.registry
+
+    def plotData(self):
+        # What the plots read their variables from: the columns of the data
+        # file and of the files compared to it (see Registry)
+        return self.dataRegistry()
+
+    def openDataFile(self, path):
+        # Reads the file on a worker thread, showing the first chunk as soon as
+        # it is available. Loading another file supersedes this one
+        self.dataCache()
+        self.path = path
+        self.follower = None
+        # A result of Filter all channels belongs to the previous file
+        self.filtered_df = None
+        self.filtered_stages = None
+        self.filtered_source = None
+        def load(job):
+            with TIMINGS.timed('load'):
+                return self.readDataFile(path, job)
+
+        self.workers.submit(
+            'load',
+            load,
+            onResult=self.dataLoaded,
+            onError=self.loadFailed,
+            onProgress=self.loadProgress,
+            onPartial=self.showFirstChunk)
+
+    def readDataFile(self, path, job):
+        # Runs on the worker thread. The file is streamed in chunks into the
+        # cache and then opened as memory mapped columns, so only the variables
+        # shown in the plots are paged in. Files opened before skip the parsing
+        from CvPyGui.DataLoader import ChunkedLoader
+        from CvPyGui.LiveTail import FileFollower
+
+        dataset = ColumnDataset.open(self.cache, path)
+        if dataset is not None and dataset.meta.get('float32', True) == self.float32:
+            job.reportPartial(dataset)
+            return dataset, FileFollower.fromMeta(path, dataset.meta)
+
+        loader = ChunkedLoader(path, memory_budget=self.memory_budget, float32=self.float32)
+        job.onCancel = loader.cancel
+        if job.cancelled:
+            return None
+        try:
+            writer = self.cache.writer(path, loader.dtypes)
+            try:
+                complete = loader.loadInto(writer, onProgress=job.reportProgress,
+                                           onFirstChunk=job.reportPartial)
+            except Exception:
+                writer.abort()
+                raise
+        except OSError as error:
+            # Without a usable cache directory the file is kept in memory
+            LOG.warning('Could not cache %s: %s', path, error)
+            loader = ChunkedLoader(path, memory_budget=self.memory_budget,
+                                   dtypes=loader.dtypes)
+            job.onCancel = loader.cancel
+            return loader.load(onProgress=job.reportProgress), FileFollower.fromLoader(loader)
+        if not complete:
+            writer.abort()
+            return None
+        # The entry holds exactly the rows read, whatever the logger appended
+        # since, so it is opened as written rather than looked up again
+        meta = writer.close({'t0': None if loader.t0 is None else float(loader.t0),
+                             'end_offset': loader.end_offset,
+                             'float32': self.float32},
+                            key=loader.key)
+        return ColumnDataset(self.cache, path, meta), FileFollower.fromLoader(loader)
+
+    def dataLoaded(self, result):
+        self.statusbar.clearMessage()
+        if result is None or result[0] is None:
+            return
+        self.original_df, self.follower = result
+        self.dataRegistry().setReference(self.path, self.original_df)
+        for plot in self.plots:
+            plot.reloadVariable()
+
+    def loadFailed(self, message):
+        reportError(self.statusbar, 'Could not load {}'.format(self.path), message)
+
+    def showFirstChunk(self, chunk):
+        self.original_df = chunk
+        self.dataRegistry().setReference(self.path, chunk)
+        self.updateVariableLists()
+
+    def updateVariableLists(self):
+        variables = list(self.plotData())
         for plot in self.plots:
-            plot.comboLoadVariable.addItems(list(self.original_df))
+            plot.comboLoadVariable.clear()
+            plot.comboLoadVariable.addItems(variables)
+            if plot.variable_name in variables:
+                plot.comboLoadVariable.setCurrentText(plot.variable_name)
             plot.connectButtons()
+
+    def loadProgress(self, fraction):
+        self.statusbar.showMessage('Loading {}: {:.0%}'.format(self.path, fraction))
+
+    def compareDataFileDialog(self):
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, 'Compare with data file', 'Desktop', "Data file (*.csv, *.txt)")
+        if file_path:
+            self.compareDataFile(file_path)
+
+    def compareDataFile(self, path):
+        # Loads another run next to the data file, through the same cache, so
+        # its channels and their differences to the data file can be plotted.
+        # Several files load in parallel
+        self.dataCache()
+        self.workers.submit(
+            ('compare', path),
+            lambda job: self.readDataFile(path, job),
+            onResult=lambda result: self.comparedLoaded(path, result),
+            onError=lambda message: reportError(
+                self.statusbar, 'Could not load {}'.format(path), message),
+            onProgress=lambda fraction: self.statusbar.showMessage(
+                'Loading {}: {:.0%}'.format(path, fraction)))
+
+    def comparedLoaded(self, path, result):
+        if result is None or result[0] is None:
+            return
+        label = self.dataRegistry().add(path, result[0])
+        self.statusbar.showMessage('Comparing with {} as {!r}'.format(path, label))
+        if hasattr(self, 'original_df'):
+            self.updateVariableLists()
+        # Plots restored from a session may be waiting for this file
+        for plot in self.plots:
+            if plot.variable_name is not None and ' @ ' in plot.variable_name:
+                plot.reloadVariable()
+
+    def closeComparedFiles(self):
+        if self.registry is None:
+            return
+        self.registry.clearCompared()
+        if hasattr(self, 'original_df'):
+            self.updateVariableLists()
+
+    def filterAllChannels(self):
+        # Applies the filters of the first plot to every channel of the data
+        # file in one go, on all cores. The result is kept in filtered_df
+        if not hasattr(self, 'original_df'):
+            return
+        data = self.original_df
+        stages = self.plots[0].stages()
+
+        def run(job):
+            start = time.perf_counter()
+            return self.filterChannels(data, stages), data, stages, time.perf_counter() - start
+
+        self.statusbar.showMessage('Filtering all channels')
+        self.workers.submit('filter_all', run, onResult=self.channelsFiltered,
+                            onError=self.filterFailed)
+
+    @staticmethod
+    def filterChannels(data, stages):
+        # Runs on a worker thread: every float channel through the stages
+        from CvPyGui.DataLoader import TIME_COLUMN
+        from CvPyGui.FilterPipeline import applyStagesToColumns
+        columns = [column for column in data
+                   if column != TIME_COLUMN and data[column].dtype.kind == 'f']
+        return applyStagesToColumns(data, stages, columns)
+
+    def channelsFiltered(self, result):
+        # The dataset filtered is kept too: the result only stands for it
+        self.filtered_df, self.filtered_source, self.filtered_stages, seconds = result
+        self.statusbar.showMessage('Filtered {} channels in {:.2f} s'.format(
+            len(self.filtered_df.columns), seconds))
+
+    def filterFailed(self, message):
+        reportError(self.statusbar, 'Could not filter the channels', message)
+
+    def exportPath(self, title):
+        from CvPyGui.Export import EXPORT_FILTER, exportFormat
+        path, name_filter = QFileDialog.getSaveFileName(self, title, 'Desktop', EXPORT_FILTER)
+        if not path:
+            return None
+        if not os.path.splitext(path)[1] and '*' in name_filter:
+            # The first extension of the chosen filter, as in 'CSV (*.csv)'
+            path += name_filter[name_filter.index('*') + 1:].split()[0].rstrip(')')
+        try:
+            exportFormat(path)
+        except ValueError as error:
+            self.statusbar.showMessage(str(error))
+            return None
+        return path
+
+    def exportPlots(self):
+        # The filtered series of the plots, one column each. Lean plots reuse
+        # their output buffers, so their filter runs wait until the export has
+        # written them instead of the series being copied
+        plots = [plot for plot in self.plots if plot.variable_df is not None]
+        if not plots:
+            self.statusbar.showMessage('No plot to export')
+            return
+        path = self.exportPath('Export plot data')
+        if not path:
+            return
+        series = [plot.variable_df for plot in plots]
+        locks = [pipeline.run_lock for plot in plots if plot.lean
+                 for pipeline in (plot.pipeline, plot.preview_pipeline)]
+        self.export(path, lambda: series, locks)
+
+    def exportChannels(self):
+        # Every channel through the filters of the first plot. A result of
+        # Filter all channels with the same filters is reused
+        if not hasattr(self, 'original_df'):
+            self.statusbar.showMessage('No data file loaded')
+            return
+        path = self.exportPath('Export filtered channels')
+        if not path:
+            return
+        data = self.original_df
+        stages = self.plots[0].stages()
+        if (getattr(self, 'filtered_df', None) is not None and self.filtered_source is data
+                and self.filtered_stages == stages):
+            filtered = self.filtered_df
+            self.export(path, lambda: filtered)
+        else:
+            self.export(path, lambda: self.filterChannels(data, stages))
+
+    def export(self, path, data, locks=()):
+        # Writes data() on a worker, streamed by chunks of rows so the file
+        # is written without a second copy of the data in memory. The locks
+        # are held while writing
+        def run(job):
+            from CvPyGui.Export import exportData
+            start = time.perf_counter()
+            with ExitStack() as stack:
+                for lock in locks:
+                    stack.enter_context(lock)
+                rows = exportData(data(), path, onProgress=job.reportProgress)
+            return path, rows, time.perf_counter() - start
+
+        self.statusbar.showMessage('Exporting {}'.format(path))
+        self.workers.submit(
+            'export', run,
+            onResult=lambda result: self.statusbar.showMessage(
+                'Exported {1} rows to {0} in {2:.2f} s'.format(*result)),
+            onError=self.exportFailed,
+            onProgress=lambda fraction: self.statusbar.showMessage(
+                'Exporting {}: {:.0%}'.format(path, fraction)))
+
+    def exportFailed(self, message):
+        reportError(self.statusbar,
+                    'Could not export: {}'.format(message.strip().splitlines()[-1]), message)
+
+    def saveSessionDialog(self):
+        from CvPyGui.Session import SESSION_FILTER, PlotState, saveSession
+        path, _ = QFileDialog.getSaveFileName(self, 'Save session', 'Desktop', SESSION_FILTER)
+        if not path:
+            return
+        if not os.path.splitext(path)[1]:
+            path += '.cvsession'
+        saveSession(path, getattr(self, 'path', None),
+                    [PlotState(plot.variable_name, plot.stages()) for plot in self.plots],
+                    self.plotManager.x_range, self.float32,
+                    [] if self.registry is None else self.registry.comparedPaths())
+        self.statusbar.showMessage('Session saved to {}'.format(path))
+
+    def openSessionDialog(self):
+        from CvPyGui.Session import SESSION_FILTER
+        path, _ = QFileDialog.getOpenFileName(self, 'Open session', 'Desktop', SESSION_FILTER)
+        if path:
+            self.openSession(path)
+
+    def openSession(self, path):
+        # Restores the plots and their filters right away and reopens the data
+        # file (from the data cache when it was opened before). Each plot loads
+        # and filters its variable only once it is scrolled into view
+        from CvPyGui.Session import loadSession
+        try:
+            session = loadSession(path)
+        except (OSError, ValueError) as error:
+            self.statusbar.showMessage(str(error))
+            return
+        states = session['plots']
+        while len(self.plots) < len(states):
+            self.addPlot()
+        for plot in self.plots[max(1, len(states)):]:
+            self.plotManager.removePlot(plot)
+        for plot, state in zip(self.plots, states):
+            plot.setStages(state.stages)
+            plot.variable_name = state.variable
+        if session.get('x_range') is not None:
+            self.plotManager.x_range = session['x_range']
+            for plot in self.plots:
+                plot.pending_x_range = session['x_range']
+        if session.get('float32', True) != self.float32:
+            self.float32 = session.get('float32', True)
+            self.actionSingle_precision.blockSignals(True)
+            self.actionSingle_precision.setChecked(self.float32)
+            self.actionSingle_precision.blockSignals(False)
+        if session.get('data_file'):
+            self.stopFollowing()
+            self.openDataFile(session['data_file'])
+        self.closeComparedFiles()
+        for compared in session.get('compared_files', []):
+            self.compareDataFile(compared)
+        self.statusbar.showMessage('Session {} restored'.format(path))
+
+    def openImageWorkspace(self):
+        # OpenCV is only imported when the image workspace is first opened
+        if getattr(self, 'image_workspace', None) is None:
+            from CvPyGui.ImageWorkspace import ImageWorkspace
+            self.image_workspace = ImageWorkspace()
+        self.image_workspace.show()
+        self.image_workspace.raise_()
+
+    def following(self):
+        return self.follow_timer.isActive()
+
+    def toggleFollow(self, checked):
+        # Following a file parses only the rows the logger appends to it and
+        # pushes them through the filters of each plot. Stopping reloads the
+        # file, so the cache and the full resolution filters catch up
+        if not checked:
+            if self.following():
+                self.stopFollowing()
+                self.openDataFile(self.path)
+            return
+        if self.follower is None:
+            self.actionFollow_file.setChecked(False)
+            return
+        for plot in self.plots:
+            plot.startFollowing()
+        self.follow_timer.start()
+
+    def stopFollowing(self):
+        self.follow_timer.stop()
+        self.workers.cancel('tail')
+        for plot in self.plots:
+            plot.stopFollowing()
+        self.actionFollow_file.blockSignals(True)
+        self.actionFollow_file.setChecked(False)
+        self.actionFollow_file.blockSignals(False)
+
+    def pollFile(self):
+        if self.workers.isBusy('tail'):
+            return
+        follower = self.follower
+        self.workers.submit('tail', lambda job: TIMINGS.wrap('tail', follower.readNew)(),
+                            onResult=self.rowsAppended, onError=self.followFailed)
+
+    def rowsAppended(self, rows):
+        if rows is None or not len(rows):
+            return
+        for plot in self.plots:
+            plot.appendRows(rows)
+
+    def followFailed(self, message):
+        self.stopFollowing()
+        reportError(self.statusbar, 'Stopped following {}'.format(self.path), message)
+
+    def toggleTimings(self, checked):
+        # Last duration of every instrumented step. Steps of the GUI thread
+        # are shown against the frame budget, in red when they go over it
+        self.timingsLabel.setVisible(checked)
+        if checked:
+            self.updateTimings()
+            self.timings_timer.start()
+        else:
+            self.timings_timer.stop()
+
+    def updateTimings(self):
+        parts = []
+        for name, last, mean, worst, runs in TIMINGS.summary():
+            if name in ('draw', 'blit'):
+                text = '{} {:.1f}/{} ms'.format(name, last * 1e3, self.frame_budget)
+                if last * 1e3 > self.frame_budget:
+                    text = '<span style="color: red">{}</span>'.format(text)
+            else:
+                text = '{} {:.1f} ms'.format(name, last * 1e3)
+            parts.append(text)
+        self.timingsLabel.setText(' | '.join(parts) or 'no timings yet')
+
+    def toggleProfile(self, checked):
+        # Profiles the GUI thread and the jobs until unchecked, then saves the
+        # report (sorted by cumulative time)
+        if checked:
+            CAPTURE.start()
+            self.statusbar.showMessage('Profiling')
+            return
+        report = CAPTURE.stop()
+        path, _ = QFileDialog.getSaveFileName(
+            self, 'Save profile', 'profile-{}.txt'.format(time.strftime('%Y%m%d-%H%M%S')),
+            'Text file (*.txt)')
+        if not path:
+            self.statusbar.clearMessage()
+            return
+        with open(path, 'w') as f:
+            f.write(report)
+        self.statusbar.showMessage('Profile saved to {}'.format(path))
+
+    def setLean(self, lean):
+        # Lean plots keep a fixed set of output buffers instead of memoizing
+        # every filter output, so memory stays flat while tweaking filters
+        for plot in self.plots:
+            plot.setLean(lean)
+
+    def setSinglePrecision(self, checked):
+        # Reloads the data file with the new precision
+        self.float32 = checked
+        if hasattr(self, 'path'):
+            self.stopFollowing()
+            self.openDataFile(self.path)
+
+    def clearCache(self):
+        self.dataCache().clear()
+        self.statusbar.showMessage('Data cache cleared')
+
+    def closeEvent(self, event):
+        if CAPTURE.active():
+            CAPTURE.stop()
+        self.workers.cancelAll()
+        super().closeEvent(event)
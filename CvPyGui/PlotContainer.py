@@ -1,76 +1,582 @@
-import pandas as pd
-from PyQt5.QtCore import Qt
-from PyQt5.QtWidgets import (QWidget, QLabel, QHBoxLayout,
-                             QVBoxLayout, QPushButton, QSlider,
-                             QComboBox)
+from collections import OrderedDict
 
-from matplotlib.backends.backend_qt4agg import NavigationToolbar2QT as NavigationToolbar
-from matplotlib.backends.backend_qt4agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtWidgets import (QWidget, QLabel, QHBoxLayout,
+                             QVBoxLayout, QPushButton, QComboBox,
+                             QFileDialog)
 
 from .FilterCvQtContainer import Filter
+from .Profiling import TIMINGS
+from .Workers import reportError
 
-import random
+# The data and plotting modules (numpy, pandas, matplotlib) are imported when
+# a variable is first loaded, not when the window is built
 
 class SinglePlotContainer(QWidget):
 
+    # Emitted when the canvas is created and when the user pans or zooms in x
+    canvasCreated = pyqtSignal()
+    xRangeChanged = pyqtSignal(float, float)
+    # Time under the mouse (NaN when it leaves the axes), and time range
+    # selected by dragging with the right button
+    cursorMoved = pyqtSignal(float)
+    regionSelected = pyqtSignal(float, float)
+
     num_plots = 0
+    # Filter changes are coalesced to at most one recompute per frame
+    frame_interval = 16
+    # While dragging a slider the filters run on about this many samples
+    preview_samples = 200000
+    # Lean plots reuse the filter output buffers instead of memoizing outputs
+    # and pyramids (see FilterPipeline.runLean)
+    lean = False
 
     def __init__(self, parent=None):
         super().__init__()
 
         self.num_plots += 1
 
-        self.variable_df = pd.DataFrame()
+        self.variable_df = None
+        self.variable_name = None
+        self.pyramid = None
+        self.line = None
+        self.cursor = None
+        self.selector = None
+        self.background = None
+        # RegionSums of the plotted series, built with its pyramid on the worker
+        # (or on the first region selected after rows were streamed in)
+        self.region_sums = None
+        self.buttons_connected = False
+        # Created with the first data file (see ensurePipelines). Loading a
+        # variable builds new pipelines on the worker, which replace these on
+        # the GUI thread once the load finished (see variableLoaded)
+        self.pipeline = None
+        # Raw samples and filter state while the data file is being followed
+        self.live_x = None
+        self.live_raw = None
+        self.stream = None
+        self.preview_pipeline = None
+        self.preview_step = 1
+        # Variable whose load job is still running
+        self.loading = None
+        self.pending_preview = False
+        self.scheduler = QTimer(self)
+        self.scheduler.setSingleShot(True)
+        self.scheduler.setInterval(self.frame_interval)
+        self.scheduler.timeout.connect(self.runScheduled)
+        # Pyramids and RegionSums of the latest pipeline outputs, by pipeline
+        # output key
+        self.pyramids = OrderedDict()
 
-        self.figure = Figure() # don't use matplotlib.pyplot at all!
-        self.canvas = FigureCanvas(self.figure)
+        # The figure and its canvas are only created when a variable is first
+        # plotted with the plot in view (see ensureCanvas). Until then a label
+        # takes their place
+        self.figure = None
+        self.canvas = None
+        self.axes = None
+        self.needs_plot = False
+        # Set when the data file loaded with the plot out of view: the
+        # variable is loaded and filtered when it is scrolled into view
+        self.needs_load = False
+        self.pending_x_range = None
+        self.canvasPlaceholder = QLabel('Select a variable to plot')
+        self.canvasPlaceholder.setAlignment(Qt.AlignCenter)
+        self.canvasPlaceholder.setEnabled(False)
 
         self.hLayout = QHBoxLayout(self)
         self.dataConfigColumn = QVBoxLayout()
         self.filtersColumn = QVBoxLayout()
 
         self.hLayout.addLayout(self.dataConfigColumn)
-        self.hLayout.addWidget(self.canvas)
+        self.hLayout.addWidget(self.canvasPlaceholder, 1)
         self.hLayout.addLayout(self.filtersColumn)
 
         self.comboLoadVariable = QComboBox()
         self.dataConfigColumn.addWidget(self.comboLoadVariable)
+        # Memory held by the filter outputs and pyramids of this plot
+        self.memoryLabel = QLabel()
+        self.dataConfigColumn.addWidget(self.memoryLabel)
+        # Filters that can be added to the chain, listed with the first data
+        # file (see connectButtons)
+        self.comboAddFilter = QComboBox()
+        self.dataConfigColumn.addWidget(self.comboAddFilter)
+        self.addFilterButton = QPushButton('Add filter')
+        self.addFilterButton.setEnabled(False)
+        self.dataConfigColumn.addWidget(self.addFilterButton)
+        # The chain as a JSON file for the batch processing (see Batch)
+        self.saveChainButton = QPushButton('Save filter chain')
+        self.saveChainButton.clicked.connect(self.saveChainDialog)
+        self.dataConfigColumn.addWidget(self.saveChainButton)
+        self.dataConfigColumn.addStretch(1)
 
         self.filter1 = Filter('Moving Average', 3, 30, 5, 1)
         self.filtersColumn.addWidget(self.filter1)
+        self.filters = [self.filter1]
 
         # drawEvent = self.figure.canvas.mpl_connect('draw', self.updatePlot)
 
-        self.plotRandom()
+    def ensureCanvas(self):
+        if self.canvas is not None:
+            return
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+        from matplotlib.figure import Figure
+
+        self.figure = Figure() # don't use matplotlib.pyplot at all!
+        self.canvas = FigureCanvas(self.figure)
+        # draw_idle ends up calling canvas.draw, so every full draw is timed
+        self.canvas.draw = TIMINGS.wrap('draw', self.canvas.draw)
+        self.hLayout.replaceWidget(self.canvasPlaceholder, self.canvas)
+        self.hLayout.setStretchFactor(self.canvas, 1)
+        self.canvasPlaceholder.deleteLater()
+        self.canvasCreated.emit()
+
+    def isShown(self):
+        # Whether some part of the plot is inside the visible area
+        return not self.visibleRegion().isEmpty()
+
+    def ensurePipelines(self):
+        if self.pipeline is not None:
+            return
+        from .FilterPipeline import FilterPipeline
+        self.pipeline = FilterPipeline(lean=self.lean)
+        self.preview_pipeline = FilterPipeline(lean=self.lean)
+
+    def setLean(self, lean):
+        self.lean = lean
+        self.pyramids.clear()
+        if self.pipeline is not None:
+            self.pipeline.setLean(lean)
+            self.preview_pipeline.setLean(lean)
+            # The pipelines switch on their next run, which supersedes the
+            # one in progress
+            self.scheduleFilters()
+        self.updateMemory()
 
     def connectButtons(self):
+        self.ensurePipelines()
+        if self.buttons_connected:
+            return
+        from .FilterPipeline import FILTERS
         self.comboLoadVariable.activated[str].connect(self.loadVariable)
+        self.comboAddFilter.addItems(list(FILTERS))
+        self.addFilterButton.clicked.connect(
+            lambda: self.addFilter(self.comboAddFilter.currentText()))
+        self.addFilterButton.setEnabled(True)
+        self.buttons_connected = True
 
     def loadVariable(self, variable):
-        self.variable_df = self.parent().parent().original_df[variable]
+        # The raw series is kept by the pipeline; the filters and the
+        # decimation pyramid are computed on a worker thread. The job only
+        # fills pipelines of its own: a newer job can supersede it, so the
+        # plot state is replaced when its result is delivered
+        from .FilterPipeline import FilterPipeline
+        self.ensurePipelines()
+        self.variable_name = variable
+        self.needs_load = False
+        self.loading = variable
+        data = self.window().plotData()
+        stages = self.stages()
+        lean = self.lean
+
+        def compute(job):
+            # Differences between files are computed here on first use
+            raw_df = data[variable]
+            pipeline = FilterPipeline(lean=lean)
+            pipeline.setRaw(raw_df)
+            preview_step = max(1, len(raw_df) // self.preview_samples)
+            preview_pipeline = FilterPipeline(lean=lean)
+            preview_pipeline.setRaw(raw_df.iloc[::preview_step])
+            pyramids = OrderedDict()
+            state = pipeline, preview_pipeline, preview_step, pyramids
+            return state, self.runPipeline(stages, pipeline, pyramids)
+
+        self.workers().submit(('filter', id(self)), compute,
+                              onResult=self.variableLoaded, onError=self.variableFailed)
+
+    def variableLoaded(self, result):
+        self.loading = None
+        state, data = result
+        self.pipeline, self.preview_pipeline, self.preview_step, self.pyramids = state
+        if self.pipeline.lean != self.lean:
+            # Lean mode was toggled during the load
+            self.pipeline.setLean(self.lean)
+            self.preview_pipeline.setLean(self.lean)
+        self.setData(*data)
         self.plot()
+        if self.window().following():
+            self.startFollowing()
 
-    def plot(self):
-        if self.num_plots != 0:
-            self.axes = self.figure.add_subplot(111, sharex=self.parent().parent().plots[0].axes)
+    def variableFailed(self, message):
+        reportError(self.window().statusbar, 'Could not load {}'.format(self.loading), message)
+        self.loading = None
+
+    def stages(self):
+        return [filter.stage() for filter in self.filters]
+
+    def addFilter(self, name, k=None):
+        # Appends a filter to the chain, with its initial value or k
+        from .FilterPipeline import FILTER_PARAMETERS
+        minimum, maximum, initial, odd_only = FILTER_PARAMETERS[name]
+        filter = Filter(name, minimum, maximum, initial, 1)
+        filter.odd_only = odd_only
+        filter.defaultK = initial if k is None else k
+        if not odd_only:
+            filter.thresh_sld.setSingleStep(1)
+        self.filtersColumn.addWidget(filter)
+        self.filters.append(filter)
+        filter.resetValue()
+        self.scheduleFilters()
+        return filter
+
+    def saveChainDialog(self):
+        from .FilterPipeline import saveChain
+        path, _ = QFileDialog.getSaveFileName(self, 'Save filter chain', 'Desktop',
+                                              'Filter chain (*.json)')
+        if not path:
+            return
+        try:
+            saveChain(path, self.stages())
+        except OSError as error:
+            reportError(self.window().statusbar, 'Could not save {}: {}'.format(path, error))
+            return
+        self.window().statusbar.showMessage('Saved the filter chain to {}'.format(path))
+
+    def setStages(self, stages):
+        # Replaces the filters by a chain (from a session file)
+        for filter in self.filters:
+            self.filtersColumn.removeWidget(filter)
+            filter.deleteLater()
+        self.filters = []
+        for name, params in stages:
+            self.addFilter(name, params.get('k'))
+        self.scheduleFilters()
+
+    def deleteFilter(self, filter_number):
+        for filter in self.filters:
+            if filter.filter_number == filter_number:
+                self.filters.remove(filter)
+                self.filtersColumn.removeWidget(filter)
+                filter.deleteLater()
+                self.scheduleFilters()
+                return
+
+    def scheduleFilters(self, preview=False):
+        # Bursts of slider events start a single recompute one frame later,
+        # which uses the latest values. A full resolution request wins over
+        # previews asked in the same frame
+        if self.scheduler.isActive():
+            self.pending_preview = self.pending_preview and preview
+        else:
+            self.pending_preview = preview
+            self.scheduler.start()
+
+    def runScheduled(self):
+        self.processFilters(self.pending_preview)
+
+    def processFilters(self, preview=False):
+        # A new parameter supersedes the computation still running for this
+        # plot. Previews filter a strided copy of the raw series
+        if self.loading is not None:
+            # The pipelines still hold the previous variable: the load is
+            # submitted again with the current filters instead
+            self.loadVariable(self.loading)
+            return
+        if self.pipeline is None or self.pipeline.raw is None:
+            return
+        stages = self.stages()
+        pyramids = self.pyramids
+        if self.live_raw is not None:
+            import pandas as pd
+            from .FilterPipeline import FilterPipeline
+
+            # While following, the filters rerun on everything received so
+            # far, in a new pipeline that replaces the plot's with the result
+            x, raw = self.live_x.view(), self.live_raw.view()
+            raw_df = pd.Series(raw, index=pd.Index(x, name=self.pipeline.raw.index.name),
+                               name=self.variable_name)
+            lean = self.lean
+
+            def run(job):
+                pipeline = FilterPipeline(lean=lean)
+                pipeline.setRaw(raw_df)
+                pyramids = OrderedDict()
+                return (pipeline, pyramids), self.runPipeline(stages, pipeline, pyramids)
+
+            self.workers().submit(('filter', id(self)), run,
+                                  onResult=self.liveProcessed)
+            return
+        if preview and self.preview_step > 1:
+            from .FilterPipeline import previewStages
+            stages = previewStages(stages, self.preview_step)
+            pipeline = self.preview_pipeline
         else:
+            pipeline = self.pipeline
+        self.workers().submit(('filter', id(self)),
+                              lambda job: self.runPipeline(stages, pipeline, pyramids),
+                              onResult=self.filtersProcessed)
+
+    def liveProcessed(self, result):
+        (self.pipeline, self.pyramids), data = result
+        self.filtersProcessed(data)
+
+    def filtersProcessed(self, result):
+        self.setData(*result)
+        if self.live_raw is not None:
+            self.resetStream()
+        self.updatePlot()
+
+    def startFollowing(self):
+        # Keeps growable copies of the raw series, so appended rows can go
+        # through the filters incrementally
+        if self.pipeline is None or self.pipeline.raw is None or self.pyramid is None:
+            return
+        import numpy as np
+        from .Buffers import GrowableArray
+
+        raw = self.pipeline.raw
+        self.live_x = GrowableArray(raw.index.to_numpy(dtype=np.float64))
+        self.live_raw = GrowableArray(raw.to_numpy())
+        self.resetStream()
+
+    def stopFollowing(self):
+        self.live_x = None
+        self.live_raw = None
+        self.stream = None
+
+    def resetStream(self):
+        # New filter state for the current stages, warmed up with the last raw
+        # samples so the plotted tail gets its complete windows
+        from .LiveTail import StreamingPipeline
+        try:
+            self.stream = StreamingPipeline(self.stages())
+        except ValueError:
+            self.stream = None
+            return
+        # The streamed rows grow the shown pyramid in place, so it no longer
+        # matches the filter output it is memoized under
+        for key in [key for key, (pyramid, _) in self.pyramids.items() if pyramid is self.pyramid]:
+            del self.pyramids[key]
+        position = max(0, min(len(self.pyramid), len(self.live_raw)) - self.stream.warmup)
+        self.pushRaw(self.live_raw.view()[position:], position)
+
+    def pushRaw(self, values, position):
+        start, filtered = self.stream.push(values, position)
+        if len(filtered):
+            self.region_sums = None
+            self.pyramid.replaceFrom(start, self.live_x.view()[start:start + len(filtered)], filtered)
+
+    def appendRows(self, rows):
+        # Cost depends on the number of new rows only: they are filtered with
+        # the carried window state and added to the pyramid's last buckets
+        if self.live_raw is None or self.variable_name not in rows:
+            return
+        end = self.pyramid.xRange()[1]
+        position = len(self.live_raw)
+        values = rows[self.variable_name].to_numpy()
+        self.live_x.extend(rows.index.to_numpy(dtype=self.live_x.dtype))
+        self.live_raw.extend(values)
+        if self.stream is None:
+            # Stages that can not run incrementally are rerun on everything
+            self.scheduleFilters()
+            return
+        self.pushRaw(values, position)
+        if self.line is None:
+            return
+
+        # When the end of the data was in view, the view scrolls with it
+        xmin, xmax = self.axes.get_xlim()
+        if xmax >= end:
+            shift = self.pyramid.xRange()[1] - end
+            self.axes.set_xlim(xmin + shift, xmax + shift)
+        else:
+            self.updatePlot()
+
+    def runPipeline(self, stages, pipeline=None, pyramids=None, max_pyramids=8):
+        # Runs on the worker thread: output of the filter stages, its pyramid
+        # and its RegionSums (so selecting a region never scans the series on
+        # the GUI thread), memoized in `pyramids` (the plot's by default)
+        from .Decimation import MinMaxPyramid
+        from .TimeIndex import RegionSums
+        if pipeline is None:
+            pipeline = self.pipeline
+        if pyramids is None:
+            pyramids = self.pyramids
+        filtered_df, key = pipeline.run(stages)
+        memo = pyramids.get(key)
+        if memo is None:
+            with TIMINGS.timed('pyramid'):
+                pyramid = MinMaxPyramid.fromSeries(filtered_df)
+                memo = pyramid, RegionSums(pyramid.y)
+            # Lean pipelines overwrite their outputs, so their pyramids can not
+            # be kept for later
+            if not pipeline.lean:
+                pyramids[key] = memo
+            while len(pyramids) > max_pyramids:
+                pyramids.popitem(last=False)
+        return (filtered_df,) + memo
+
+    def setData(self, variable_df, pyramid, region_sums=None):
+        self.variable_df = variable_df
+        self.pyramid = pyramid
+        self.region_sums = region_sums
+        for pipeline in (self.pipeline, self.preview_pipeline):
+            if pipeline is not None:
+                pipeline.setDisplayed(pyramid.y)
+        self.updateMemory()
+
+    def memoryUsage(self):
+        # Bytes held by the filter outputs and the pyramids of this plot (the
+        # raw series is memory mapped from the data cache)
+        total = 0
+        if self.pipeline is not None:
+            total += self.pipeline.memoryUsage() + self.preview_pipeline.memoryUsage()
+        pyramids = [pyramid for pyramid, _ in self.pyramids.values()]
+        if self.pyramid is not None and all(self.pyramid is not other for other in pyramids):
+            pyramids.append(self.pyramid)
+        total += sum(pyramid.memoryUsage() for pyramid in pyramids)
+        for buffer in (self.live_x, self.live_raw):
+            if buffer is not None:
+                total += buffer.nbytes
+        return total
+
+    def updateMemory(self):
+        self.memoryLabel.setText('Memory: {:.1f} MB'.format(self.memoryUsage() / 1e6))
+
+    def workers(self):
+        return self.window().workers
+
+    def reloadVariable(self):
+        # Reloads the selected variable after the data file finished loading.
+        # Plots out of view wait until they are scrolled into view
+        if self.variable_name not in self.window().plotData():
+            return
+        if not self.isShown():
+            self.needs_load = True
+            return
+        self.loadVariable(self.variable_name)
+
+    def plot(self):
+        # The axes and the line are created once, with the first variable
+        # loaded. Later loads and filter updates only replace the line data.
+        # Plots out of view are drawn when they are scrolled into view
+        if not self.isShown():
+            self.needs_plot = True
+            return
+        self.ensureCanvas()
+        self.needs_plot = False
+        if self.line is None:
+            self.figure.clear()
             self.axes = self.figure.add_subplot(111)
-        self.axes.clear()
-        self.axes.plot(self.variable_df, '-')
-        self.canvas.draw()
+            self.line, = self.axes.plot([], [], '-', animated=True)
+            self.cursor = self.axes.axvline(0, color='0.5', linewidth=0.8,
+                                            animated=True, visible=False)
+            self.axes.callbacks.connect('xlim_changed', self.xlimChanged)
+            self.canvas.mpl_connect('draw_event', self.onDraw)
+            self.canvas.mpl_connect('motion_notify_event', self.onMotion)
+            self.canvas.mpl_connect('axes_leave_event', lambda event: self.cursorMoved.emit(float('nan')))
+            from matplotlib.widgets import SpanSelector
+            self.selector = SpanSelector(self.axes, self.regionSelected.emit, 'horizontal',
+                                         button=3, minspan=0, props=dict(alpha=0.2))
+        self.line.set_data(*self.visibleData(*self.pyramid.xRange()))
+        self.axes.relim()
+        if self.pending_x_range is not None:
+            # Follows the x range of the other plots
+            self.axes.set_xlim(*self.pending_x_range, emit=False)
+            self.pending_x_range = None
+            self.line.set_data(*self.visibleData())
+            self.axes.autoscale_view(scalex=False)
+        else:
+            self.axes.autoscale_view()
+            self.xRangeChanged.emit(*self.axes.get_xlim())
+        self.canvas.draw_idle()
+
+    def setXRange(self, xmin, xmax):
+        # Applies the x range of another plot. Plots out of view keep it
+        # until they are shown again
+        if self.line is None or not self.isShown():
+            self.pending_x_range = (xmin, xmax)
+            return
+        self.pending_x_range = None
+        self.axes.set_xlim(xmin, xmax, emit=False)
+        self.line.set_data(*self.visibleData())
+        self.canvas.draw_idle()
+
+    def applyPendingXRange(self):
+        if self.pending_x_range is not None and self.line is not None:
+            self.setXRange(*self.pending_x_range)
 
     def updatePlot(self):
-        ymax,ymin = self.axes.get_ylim()
-        self.axes.clear()
-        self.axes.set_ylim(ymax,ymin)
-        self.axes.plot(self.variable_df, '-')
-        self.canvas.draw()
-
-    def plotRandom(self):
-        ''' plot some random stuff '''
-        data = [random.random() for i in range(10)]
-        self.axes = self.figure.add_subplot(111)
-        self.axes.clear()
-        self.axes.plot(data, '-')
-        self.canvas.draw()
+        # Keeps the current limits and only redraws the line over the cached
+        # background of the axes
+        if self.line is None:
+            return
+        self.line.set_data(*self.visibleData())
+        self.blitLine()
+
+    def onDraw(self, event):
+        # After every full draw the axes without the (animated) line are saved
+        # as background and the line is painted on top of it
+        self.background = self.canvas.copy_from_bbox(self.axes.bbox)
+        self.axes.draw_artist(self.line)
+        self.axes.draw_artist(self.cursor)
+
+    def blitLine(self):
+        if self.background is None:
+            self.canvas.draw_idle()
+            return
+        with TIMINGS.timed('blit'):
+            self.canvas.restore_region(self.background)
+            self.axes.draw_artist(self.line)
+            self.axes.draw_artist(self.cursor)
+            self.canvas.blit(self.axes.bbox)
+
+    def onMotion(self, event):
+        if event.inaxes is self.axes and event.xdata is not None:
+            self.cursorMoved.emit(event.xdata)
+
+    def setCursor(self, t):
+        # Moves the vertical cursor line to time t (hides it for NaN) and
+        # returns the time and value of the plotted sample closest to t
+        if self.line is None:
+            return None
+        import numpy as np
+        from .TimeIndex import TimeIndex
+
+        visible = not np.isnan(t)
+        if visible or self.cursor.get_visible():
+            self.cursor.set_xdata([t, t])
+            self.cursor.set_visible(visible)
+            self.blitLine()
+        if not visible:
+            return None
+        row = TimeIndex(self.pyramid.x).nearest(t)
+        if row is None:
+            return None
+        return self.pyramid.x[row], self.pyramid.y[row]
+
+    def regionStatistics(self, tmin, tmax):
+        # Statistics of the plotted series between tmin and tmax
+        if self.pyramid is None:
+            return None
+        from .TimeIndex import RegionSums, regionStatistics
+
+        # The sums come with the pyramid (see runPipeline), except after live
+        # rows grew it (see pushRaw)
+        if self.region_sums is None:
+            self.region_sums = RegionSums(self.pyramid.y)
+        return regionStatistics(self.pyramid, self.region_sums, tmin, tmax)
+
+    def visibleData(self, xmin=None, xmax=None):
+        # Min/max envelope of the samples in the visible x range, with about
+        # two points per pixel column of the axes
+        if xmin is None:
+            xmin, xmax = self.axes.get_xlim()
+        pixels = self.axes.get_window_extent().width
+        return self.pyramid.decimate(xmin, xmax, pixels)
+
+    def xlimChanged(self, axes):
+        # Zooming or panning picks the pyramid level matching the new range
+        if self.line is not None and self.pyramid is not None:
+            self.line.set_data(*self.visibleData())
+            self.canvas.draw_idle()
+            self.xRangeChanged.emit(*axes.get_xlim())
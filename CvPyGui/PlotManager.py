@@ -0,0 +1,118 @@
+from PyQt5.QtCore import QTimer, pyqtSignal
+from PyQt5.QtWidgets import QScrollArea, QVBoxLayout, QWidget
+
+from .PlotContainer import SinglePlotContainer
+
+
+class PlotManager(QScrollArea):
+    """Scrollable stack of plots sharing their x range"""
+
+    # Emitted with each plot whose canvas has just been created
+    canvasCreated = pyqtSignal(object)
+    # Time under the mouse with the [(variable, time, value)] of the sample
+    # closest to it in each plot, and time range selected with the
+    # [(variable, statistics)] of each plot over it
+    cursorReadout = pyqtSignal(float, object)
+    regionStatistics = pyqtSignal(float, float, object)
+
+    # Height of each plot, and interval between two x range synchronizations (ms)
+    plot_height = 250
+    sync_interval = 30
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.plots = []
+        self.x_range = None
+        self.sync_source = None
+        self.cursor_time = float('nan')
+
+        self.setWidgetResizable(True)
+        self.container = QWidget()
+        self.plotsLayout = QVBoxLayout(self.container)
+        self.plotsLayout.addStretch(1)
+        self.setWidget(self.container)
+
+        # Pans and zooms of one plot reach the others through this timer, so
+        # a burst of x range changes makes a single update of each other plot
+        self.sync_timer = QTimer(self)
+        self.sync_timer.setSingleShot(True)
+        self.sync_timer.setInterval(self.sync_interval)
+        self.sync_timer.timeout.connect(self.applyXRange)
+        # The cursor is moved on all plots at most once per sync_interval too
+        self.cursor_timer = QTimer(self)
+        self.cursor_timer.setSingleShot(True)
+        self.cursor_timer.setInterval(self.sync_interval)
+        self.cursor_timer.timeout.connect(self.applyCursor)
+
+        self.verticalScrollBar().valueChanged.connect(self.updateVisible)
+
+    def addPlot(self):
+        plot = SinglePlotContainer()
+        plot.setMinimumHeight(self.plot_height)
+        plot.canvasCreated.connect(lambda: self.canvasCreated.emit(plot))
+        plot.xRangeChanged.connect(lambda xmin, xmax: self.xRangeChanged(plot, xmin, xmax))
+        plot.cursorMoved.connect(self.cursorMoved)
+        plot.regionSelected.connect(self.regionSelected)
+        if self.x_range is not None:
+            plot.pending_x_range = self.x_range
+        self.plotsLayout.insertWidget(len(self.plots), plot)
+        self.plots.append(plot)
+        QTimer.singleShot(0, self.updateVisible)
+        return plot
+
+    def removePlot(self, plot):
+        self.plots.remove(plot)
+        self.plotsLayout.removeWidget(plot)
+        plot.deleteLater()
+        QTimer.singleShot(0, self.updateVisible)
+
+    def updateVisible(self):
+        # Loads and draws the plots scrolled into view that got data while
+        # hidden, and gives them the x range they missed
+        for plot in self.plots:
+            if plot.isShown():
+                if plot.needs_load:
+                    plot.reloadVariable()
+                if plot.needs_plot:
+                    plot.plot()
+                plot.applyPendingXRange()
+
+    def xRangeChanged(self, source, xmin, xmax):
+        self.x_range = (xmin, xmax)
+        self.sync_source = source
+        if not self.sync_timer.isActive():
+            self.sync_timer.start()
+
+    def applyXRange(self):
+        for plot in self.plots:
+            if plot is not self.sync_source:
+                plot.setXRange(*self.x_range)
+
+    def cursorMoved(self, t):
+        self.cursor_time = t
+        if not self.cursor_timer.isActive():
+            self.cursor_timer.start()
+
+    def applyCursor(self):
+        readout = []
+        for plot in self.plots:
+            sample = plot.setCursor(self.cursor_time)
+            if sample is not None:
+                readout.append((plot.variable_name,) + tuple(sample))
+        self.cursorReadout.emit(self.cursor_time, readout)
+
+    def regionSelected(self, tmin, tmax):
+        statistics = []
+        for plot in self.plots:
+            region = plot.regionStatistics(tmin, tmax)
+            if region is not None:
+                statistics.append((plot.variable_name, region))
+        self.regionStatistics.emit(tmin, tmax, statistics)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.updateVisible()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        QTimer.singleShot(0, self.updateVisible)
@@ -0,0 +1,110 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+
+class Timings:
+    """Durations of the instrumented steps, for the last runs of each step"""
+
+    # Steps are timed on any thread: loading and filtering on the workers,
+    # drawing on the GUI thread. Keeping a few runs gives a mean and a worst
+    # case without growing while the application runs
+
+    def __init__(self, keep=50):
+        self.keep = keep
+        self.lock = threading.Lock()
+        self.durations = OrderedDict()
+
+    def record(self, name, seconds):
+        with self.lock:
+            durations = self.durations.get(name)
+            if durations is None:
+                durations = self.durations[name] = deque(maxlen=self.keep)
+            durations.append(seconds)
+
+    @contextmanager
+    def timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def wrap(self, name, function):
+        def timedFunction(*args, **kwargs):
+            with self.timed(name):
+                return function(*args, **kwargs)
+        return timedFunction
+
+    def summary(self):
+        # [(name, last, mean, max, runs)] in seconds, in the order the steps
+        # first ran
+        with self.lock:
+            return [(name, durations[-1], sum(durations) / len(durations), max(durations), len(durations))
+                    for name, durations in self.durations.items()]
+
+    def clear(self):
+        with self.lock:
+            self.durations.clear()
+
+
+class ProfileCapture:
+    """cProfile capture of the GUI thread and of the jobs run while it is on"""
+
+    def __init__(self):
+        self.profiles = None
+        self.lock = threading.Lock()
+
+    def active(self):
+        return self.profiles is not None
+
+    def start(self):
+        # Called on the GUI thread, which it profiles until stop
+        main = cProfile.Profile()
+        with self.lock:
+            self.profiles = [main]
+        main.enable()
+
+    @contextmanager
+    def thread(self):
+        # Profiles the body on the calling (worker) thread if a capture is on
+        if self.profiles is None:
+            yield
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Since Python 3.12 a single profiler sees every thread
+            yield
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            with self.lock:
+                if self.profiles is not None:
+                    self.profiles.append(profile)
+
+    def stop(self, sort='cumulative', limit=80):
+        # Ends the capture and returns the report as text
+        with self.lock:
+            profiles, self.profiles = self.profiles, None
+        if not profiles:
+            return ''
+        profiles[0].disable()
+        out = io.StringIO()
+        stats = pstats.Stats(profiles[0], stream=out)
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+# Shared by the whole application
+TIMINGS = Timings()
+CAPTURE = ProfileCapture()
@@ -0,0 +1,174 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from CvPyGui.DataLoader import TIME_COLUMN
+
+# Samples interpolated at a time when resampling, so the temporaries stay
+# small whatever the length of the series
+RESAMPLE_CHUNK = 1000000
+# Difference series kept for plots that switch back to them
+DERIVED_CACHE = 4
+
+
+def fileLabel(path, taken=()):
+    # Short name of a data file in variable names: its name without the
+    # extension, numbered when another file has the same name
+    base = os.path.splitext(os.path.basename(path))[0]
+    label, number = base, 2
+    while label in taken:
+        label = '{} ({})'.format(base, number)
+        number += 1
+    return label
+
+
+def overlap(*indexes):
+    # Common range of several increasing time indexes, or None
+    start = max(index[0] for index in indexes)
+    stop = min(index[-1] for index in indexes)
+    return (start, stop) if start <= stop else None
+
+
+def resampleOnto(times, values, grid, dtype=None):
+    # Linear interpolation of the samples (times increasing) at the grid
+    # times, NaN outside their range. Invalid samples are skipped
+    valid = ~np.isnan(values)
+    if not valid.all():
+        times, values = times[valid], values[valid]
+    out = np.empty(len(grid), dtype=dtype or values.dtype)
+    if not len(times):
+        out[:] = np.nan
+        return out
+    for start in range(0, len(grid), RESAMPLE_CHUNK):
+        stop = start + RESAMPLE_CHUNK
+        out[start:stop] = np.interp(grid[start:stop], times, values, left=np.nan, right=np.nan)
+    return out
+
+
+class DatasetRegistry:
+    """Data files open at the same time: a reference file and files compared to it"""
+
+    # Behaves like the dataset of a single file for the plots: iterating gives
+    # the variable names and indexing gives a Series over the zeroed time.
+    # Every file is zeroed on its own time column, so runs started at
+    # different times line up. The columns of the reference file keep their
+    # names; those of the other files are 'column @ label', and
+    # 'column @ label - reference' is their difference to the reference
+    # file, resampled onto the reference time grid where both runs overlap
+
+    def __init__(self):
+        self.reference = None
+        self.reference_label = None
+        self.compared = OrderedDict()
+        self.paths = OrderedDict()
+        self.lock = threading.Lock()
+        self.derived = OrderedDict()
+
+    def setReference(self, path, dataset):
+        self.reference = dataset
+        self.reference_label = fileLabel(path, self.compared)
+        self.clearDerived()
+
+    def add(self, path, dataset):
+        # Adds (or replaces) a compared file; returns its label
+        for label, known in self.paths.items():
+            if known == os.path.abspath(path):
+                break
+        else:
+            label = fileLabel(path, list(self.compared) + [self.reference_label])
+        self.compared[label] = dataset
+        self.paths[label] = os.path.abspath(path)
+        self.clearDerived()
+        return label
+
+    def remove(self, label):
+        self.compared.pop(label, None)
+        self.paths.pop(label, None)
+        self.clearDerived()
+
+    def clearCompared(self):
+        self.compared.clear()
+        self.paths.clear()
+        self.clearDerived()
+
+    def clearDerived(self):
+        with self.lock:
+            self.derived.clear()
+
+    def comparedPaths(self):
+        return list(self.paths.values())
+
+    def channels(self, dataset):
+        return [column for column in dataset if column != TIME_COLUMN]
+
+    def __iter__(self):
+        if self.reference is not None:
+            yield from self.reference
+        for label, dataset in self.compared.items():
+            for column in self.channels(dataset):
+                yield '{} @ {}'.format(column, label)
+            if self.reference is not None:
+                for column in self.channels(dataset):
+                    if column in self.reference:
+                        yield '{} @ {} - {}'.format(column, label, self.reference_label)
+
+    def __contains__(self, name):
+        try:
+            self.resolve(name)
+        except KeyError:
+            return False
+        return True
+
+    def resolve(self, name):
+        # (column, compared label or None, whether it is a difference)
+        if self.reference is not None and name in self.reference:
+            return name, None, False
+        if not isinstance(name, str):
+            raise KeyError(name)
+        column, separator, rest = name.rpartition(' @ ')
+        if separator:
+            suffix = ' - {}'.format(self.reference_label)
+            difference = rest.endswith(suffix) and rest[:-len(suffix)] in self.compared
+            label = rest[:-len(suffix)] if difference else rest
+            if label in self.compared and column in self.compared[label]:
+                if not difference or (self.reference is not None and column in self.reference):
+                    return column, label, difference
+        raise KeyError(name)
+
+    def __getitem__(self, name):
+        column, label, difference = self.resolve(name)
+        if label is None:
+            return self.reference[column]
+        if not difference:
+            return self.compared[label][column].rename(name)
+        with self.lock:
+            series = self.derived.get(name)
+            if series is not None:
+                self.derived.move_to_end(name)
+                return series
+        series = self.difference(column, label, name)
+        with self.lock:
+            self.derived[name] = series
+            while len(self.derived) > DERIVED_CACHE:
+                self.derived.popitem(last=False)
+        return series
+
+    def difference(self, column, label, name=None):
+        # Compared minus reference on the reference samples inside the time
+        # range both files cover
+        reference = self.reference[column]
+        other = self.compared[label][column]
+        times = reference.index.to_numpy()
+        other_times = other.index.to_numpy()
+        common = overlap(times, other_times) if len(times) and len(other_times) else None
+        if common is None:
+            return pd.Series([], index=pd.Index([], name=reference.index.name),
+                             dtype=reference.dtype, name=name)
+        start, stop = np.searchsorted(times, common[0]), np.searchsorted(times, common[1], 'right')
+        grid = times[start:stop]
+        values = resampleOnto(other_times, other.to_numpy(), grid, reference.dtype)
+        values -= reference.to_numpy()[start:stop]
+        return pd.Series(values, index=reference.index[start:stop], name=name, copy=False)
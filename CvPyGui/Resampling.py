@@ -0,0 +1,173 @@
+import importlib.util
+
+import numpy as np
+
+from CvPyGui.RollingStats import fillInvalid
+
+# Taps of the anti-alias filter per unit of decimation factor
+FIR_TAPS_PER_FACTOR = 8
+# Degree of the polynomial fitted by the Savitzky-Golay filter
+SAVGOL_ORDER = 2
+# Order of the Butterworth low-pass filter
+BUTTER_ORDER = 4
+# Samples whose spacing gives the bucket width (see bucketWidth)
+SPACING_SAMPLES = 100000
+
+# SciPy is optional (only the Butterworth filter needs it). It is looked up
+# without importing it, as importing scipy.signal takes about a second
+HAVE_SCIPY = importlib.util.find_spec('scipy') is not None
+
+
+def floatValues(values):
+    values = np.asarray(values)
+    return values if values.dtype.kind == 'f' else values.astype(np.float64)
+
+
+def firTaps(factor):
+    # Hamming windowed sinc low-pass with its cutoff at the Nyquist frequency
+    # of the decimated series, normalized to a unit gain
+    count = FIR_TAPS_PER_FACTOR * factor + 1
+    offsets = np.arange(count) - count // 2
+    taps = np.sinc(offsets / factor) * np.hamming(count)
+    return taps / taps.sum()
+
+
+def decimate(values, factor, out=None):
+    # Anti-alias filtered value at every `factor`-th sample, starting at the
+    # first one. The filter is only evaluated at the kept samples, one tap
+    # at a time over strided views, so it costs about FIR_TAPS_PER_FACTOR
+    # operations per input sample and no temporary of the input's length
+    # besides the NaN mask (and a NaN free copy when needed). Taps falling
+    # on NaN samples or past the ends are left out and the others
+    # renormalized
+    values = floatValues(values)
+    n = len(values)
+    count = -(-n // factor)
+    if out is None:
+        out = np.empty(count, dtype=values.dtype)
+    out = out[:count]
+    invalid = np.isnan(values)
+    has_invalid = invalid.any()
+    if has_invalid:
+        values = np.where(invalid, 0, values)
+    total = np.zeros(count)
+    weight = np.zeros(count)
+    taps = firTaps(factor)
+    half = len(taps) // 2
+    for tap, offset in zip(taps, range(-half, half + 1)):
+        # Outputs i whose input i * factor + offset is inside the series
+        first = -(offset // factor) if offset < 0 else 0
+        last = min(count, (n - 1 - offset) // factor + 1)
+        if last <= first:
+            continue
+        start = first * factor + offset
+        stop = (last - 1) * factor + offset + 1
+        total[first:last] += tap * values[start:stop:factor]
+        if has_invalid:
+            weight[first:last] += tap * ~invalid[start:stop:factor]
+        else:
+            weight[first:last] += tap
+    with np.errstate(invalid='ignore', divide='ignore'):
+        np.divide(total, weight, out=total)
+    total[weight <= 0] = np.nan
+    out[...] = total
+    return out
+
+
+def bucketWidth(times, factor):
+    # `factor` times the median sample spacing. The spacing is measured on
+    # the first samples, so a strided preview of a series gets a width
+    # `step` times larger for a factor `step` times smaller
+    spacing = np.diff(times[:SPACING_SAMPLES + 1])
+    spacing = spacing[spacing > 0]
+    return factor * float(np.median(spacing)) if len(spacing) else 0.0
+
+
+def buckets(times, width):
+    # Start of the samples of each non-empty bucket of the grid of `width`
+    # wide buckets aligned on time 0, and the center time of those buckets.
+    # The times must be increasing. Only the grid (about one edge per output)
+    # is allocated, never per sample arrays
+    first = np.floor(times[0] / width)
+    last = np.floor(times[-1] / width)
+    edges = np.arange(first, last + 2) * width
+    bounds = np.searchsorted(times, edges)
+    starts, stops = bounds[:-1], bounds[1:]
+    used = stops > starts
+    return starts[used], edges[:-1][used] + width / 2
+
+
+def bucketMean(values, starts, out=None):
+    # Mean of the valid samples of each bucket, NaN for buckets without any
+    values = floatValues(values)
+    if out is None:
+        out = np.empty(len(starts), dtype=values.dtype)
+    out = out[:len(starts)]
+    invalid = np.isnan(values)
+    if invalid.any():
+        sums = np.add.reduceat(np.where(invalid, 0, values), starts, dtype=np.float64)
+        counts = np.add.reduceat(~invalid, starts, dtype=np.int64)
+    else:
+        sums = np.add.reduceat(values, starts, dtype=np.float64)
+        counts = np.diff(np.append(starts, len(values)))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out[...] = sums / counts
+    return out
+
+
+def bucketMax(values, starts, out=None):
+    # Largest valid sample of each bucket, NaN for buckets without any
+    values = floatValues(values)
+    if out is None:
+        out = np.empty(len(starts), dtype=values.dtype)
+    out = out[:len(starts)]
+    np.fmax.reduceat(values, starts, out=out)
+    return out
+
+
+def savgolCoefficients(window, order=SAVGOL_ORDER):
+    # Weights giving the value at the center of the polynomial of degree
+    # `order` fitted by least squares to `window` samples
+    offsets = np.arange(window) - window // 2
+    vandermonde = np.vander(offsets, order + 1, increasing=True)
+    return np.linalg.pinv(vandermonde)[0]
+
+
+def filled(values):
+    # Copy of the values with the NaN samples taking the last valid one, as
+    # the smoothing filters can not skip them
+    values = floatValues(values)
+    if np.isnan(values).any():
+        values = values.copy()
+        fillInvalid(values)
+    return values
+
+
+def savgol(values, window, out=None):
+    # Savitzky-Golay smoothing, the ends extended with the first and last
+    # samples. OpenCV correlates the series with the (symmetric) weights in
+    # place, keeping its float32 or float64 dtype. OpenCV is imported here, so
+    # the data plots do not load it (see Startup)
+    import cv2
+
+    values = filled(values)
+    if out is None:
+        out = np.empty(values.shape, dtype=values.dtype)
+    kernel = savgolCoefficients(window).reshape(-1, 1)
+    cv2.filter2D(values.reshape(-1, 1), -1, kernel, dst=out.reshape(-1, 1),
+                 borderType=cv2.BORDER_REPLICATE)
+    return out
+
+
+def butterworth(values, period, out=None):
+    # Zero phase Butterworth low-pass passing periods longer than `period`
+    # samples, run forwards and backwards as second order sections
+    from scipy import signal
+
+    values = filled(values)
+    if out is None:
+        out = np.empty(values.shape, dtype=values.dtype)
+    sections = signal.butter(BUTTER_ORDER, 2.0 / period, output='sos')
+    padding = min(len(values) - 1, 3 * (2 * len(sections) + 1))
+    out[...] = signal.sosfiltfilt(sections, values, padlen=padding)
+    return out
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+try:
+    # Double heap moving median (O(n log k)) and O(n) moving mean/min/max
+    import bottleneck as bn
+except ImportError:
+    bn = None
+
+
+def trailing(values, k, statistic, q=None):
+    # Statistic over the trailing window [i - k + 1, i] of every row, NaN while
+    # the window is incomplete or holds a NaN. Falls back to pandas, whose
+    # rolling median and quantile use a skip list (also O(n log k))
+    if bn is not None and statistic != 'quantile':
+        move = {'median': bn.move_median, 'mean': bn.move_mean,
+                'min': bn.move_min, 'max': bn.move_max}[statistic]
+        return move(values, window=k, min_count=k, axis=0)
+    rolling = pd.DataFrame(values.reshape(len(values), -1)).rolling(window=k)
+    if statistic == 'quantile':
+        result = rolling.quantile(q)
+    else:
+        result = getattr(rolling, statistic)()
+    return result.to_numpy().reshape(values.shape)
+
+
+def centered(values, k, statistic, q=None, out=None):
+    # Statistic over a window centered on each row (the same alignment as
+    # pandas rolling(center=True)), with the incomplete windows at both ends
+    # taking the first and last complete value. Works along the first axis of
+    # 1-D or 2-D arrays and keeps their float dtype
+    values = np.asarray(values)
+    if values.dtype.kind != 'f':
+        values = values.astype(np.float64)
+    k = int(k)
+    n = len(values)
+    if out is None:
+        out = np.empty(values.shape, dtype=values.dtype)
+    if n < k or k < 1:
+        out[...] = np.nan
+        return out
+
+    # Trailing result i is the centered result of row i - shift
+    shift = (k - 1) // 2
+    start = k - 1 - shift
+    stop = n - shift
+    out[start:stop] = trailing(values, k, statistic, q)[k - 1:]
+    out[:start] = out[start]
+    out[stop:] = out[stop - 1]
+
+    # Windows holding NaN samples take the last valid value, like the ffill
+    # and bfill applied after pandas rolling
+    if np.isnan(out[start:stop]).any():
+        fillInvalid(out)
+    return out
+
+
+def fillInvalid(values):
+    # In place forward fill of the NaN rows along the first axis, with leading
+    # NaN rows taking the first valid value. Temporary arrays only hold the
+    # positions of the valid and invalid rows of one column at a time
+    for column in values.reshape(len(values), -1).T:
+        invalid = np.isnan(column)
+        valid_rows = np.flatnonzero(~invalid)
+        if not len(valid_rows) or len(valid_rows) == len(column):
+            continue
+        invalid_rows = np.flatnonzero(invalid)
+        del invalid
+        source = np.searchsorted(valid_rows, invalid_rows, side='right') - 1
+        column[invalid_rows] = column[valid_rows[np.maximum(source, 0)]]
+
+
+def rollingMedian(values, k, out=None):
+    return centered(values, k, 'median', out=out)
+
+
+def rollingMean(values, k, out=None):
+    return centered(values, k, 'mean', out=out)
+
+
+def rollingMin(values, k, out=None):
+    return centered(values, k, 'min', out=out)
+
+
+def rollingMax(values, k, out=None):
+    return centered(values, k, 'max', out=out)
+
+
+def rollingQuantile(values, k, q, out=None):
+    return centered(values, k, 'quantile', q=q, out=out)
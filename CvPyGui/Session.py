@@ -0,0 +1,50 @@
+import json
+import os
+
+from CvPyGui.FilterPipeline import chainFromJson, chainToJson
+
+SESSION_VERSION = 1
+SESSION_FILTER = 'Session (*.cvsession)'
+
+
+class PlotState:
+    """Variable and filter chain of one plot of a session"""
+
+    def __init__(self, variable, stages):
+        self.variable = variable
+        self.stages = stages
+
+
+def saveSession(path, data_file, plots, x_range=None, float32=True, compared_files=()):
+    # Sessions are JSON: the data file and the files compared to it, the
+    # precision they are loaded with, the shared x range and every plot as
+    # {"variable": ..., "filters": chain}. The data itself is not saved; it
+    # comes back from the data cache
+    session = {
+        'version': SESSION_VERSION,
+        'data_file': None if data_file is None else os.path.abspath(data_file),
+        'compared_files': [os.path.abspath(compared) for compared in compared_files],
+        'float32': float32,
+        'x_range': None if x_range is None else list(x_range),
+        'plots': [{'variable': plot.variable, 'filters': chainToJson(plot.stages)}
+                  for plot in plots],
+    }
+    with open(path, 'w') as f:
+        json.dump(session, f, indent=2)
+
+
+def loadSession(path):
+    # The session as a dict with PlotState plots. Raises ValueError for
+    # files that are not sessions or have unknown filters
+    try:
+        with open(path) as f:
+            session = json.load(f)
+    except ValueError as error:
+        raise ValueError('{} is not a session file: {}'.format(path, error))
+    if not isinstance(session, dict) or session.get('version') != SESSION_VERSION:
+        raise ValueError('{} is not a session file of this version'.format(path))
+    session['plots'] = [PlotState(plot.get('variable'), chainFromJson(plot.get('filters', []), path))
+                        for plot in session.get('plots', [])]
+    if session.get('x_range') is not None:
+        session['x_range'] = tuple(session['x_range'])
+    return session
@@ -0,0 +1,108 @@
+import builtins
+import sys
+import threading
+import time
+
+# Modules needed to load, filter and plot data, but not to show the window.
+# They are imported on a worker thread once the window is on screen
+DEFERRED_MODULES = (
+    'numpy',
+    'pandas',
+    'CvPyGui.DataLoader',
+    'CvPyGui.DataCache',
+    'CvPyGui.FilterPipeline',
+    'CvPyGui.LiveTail',
+    'CvPyGui.Decimation',
+    'matplotlib.figure',
+    'matplotlib.backends.backend_qt5agg',
+)
+
+
+def importDeferred(job=None):
+    for name in DEFERRED_MODULES:
+        if job is not None and job.cancelled:
+            return
+        __import__(name)
+
+
+def importedName(name, globals, fromlist, level):
+    # Absolute name of the module of an import statement, followed by the
+    # names taken from it
+    if level:
+        package = (globals or {}).get('__package__') or ''
+        package = package.rsplit('.', level - 1)[0] if level > 1 else package
+        name = package + '.' + name if name else package
+    if fromlist and '*' not in fromlist:
+        name = '{} ({})'.format(name, ', '.join(fromlist))
+    return name
+
+
+class ImportTimer:
+    """Times the imports made by the main thread, like python -X importtime"""
+
+    def __init__(self):
+        self.original = None
+        # (depth, name, self seconds, cumulative seconds), in the order the
+        # imports finished
+        self.records = []
+        self.stack = []
+
+    def install(self):
+        self.original = builtins.__import__
+        builtins.__import__ = self
+
+    def uninstall(self):
+        if self.original is not None:
+            builtins.__import__ = self.original
+            self.original = None
+
+    def __call__(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if (threading.current_thread() is not threading.main_thread()
+                or (level == 0 and not fromlist and name in sys.modules)):
+            return self.original(name, globals, locals, fromlist, level)
+        loaded = len(sys.modules)
+        nested = [0.0]
+        self.stack.append(nested)
+        start = time.perf_counter()
+        try:
+            return self.original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stack.pop()
+            if self.stack:
+                self.stack[-1][0] += elapsed
+            if len(sys.modules) > loaded:
+                self.records.append((len(self.stack), importedName(name, globals, fromlist, level),
+                                     elapsed - nested[0], elapsed))
+
+    def report(self, out):
+        out.write('import time: self [us] | cumulative | imported package\n')
+        for depth, name, own, cumulative in self.records:
+            out.write('import time: {:>9.0f} | {:>10.0f} | {}{}\n'.format(
+                own * 1e6, cumulative * 1e6, '  ' * depth, name))
+
+
+class StartupReport:
+    """Time spent in each startup phase, printed once the window is shown"""
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.last = self.started
+        self.phases = []
+        self.imports = ImportTimer()
+        self.imports.install()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def finish(self, out=None):
+        # Called from the first event loop iteration after window.show()
+        self.mark('window shown')
+        self.imports.uninstall()
+        out = sys.stderr if out is None else out
+        self.imports.report(out)
+        for phase, seconds in self.phases:
+            out.write('startup: {:<24} {:>8.1f} ms\n'.format(phase, seconds * 1e3))
+        out.write('startup: {:<24} {:>8.1f} ms\n'.format('total', (self.last - self.started) * 1e3))
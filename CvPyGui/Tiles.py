@@ -0,0 +1,163 @@
+import hashlib
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from CvPyGui.DataCache import DEFAULT_CACHE_DIR, DataCache, fileKey
+from CvPyGui.ImagePipeline import IMAGE_FILTERS, IMAGE_FILTER_HALOS, loadImage
+
+# Side of the square tiles processed in parallel, and images from which on
+# (in pixels) the workspace processes and shows images by tiles
+DEFAULT_TILE = 1024
+TILED_PIXELS = 50 * 1000 * 1000
+# The pyramid stops at the first level whose largest side fits this size
+PYRAMID_TOP_SIDE = 1024
+
+
+def chainHalo(stages):
+    # Pixels around a tile that affect its result: the sum of the kernel
+    # radii of the stages (twice the radius for opening and closing)
+    return sum(IMAGE_FILTER_HALOS[name] * (int(params.get('k', 1)) // 2) for name, params in stages)
+
+
+def tileGrid(height, width, tile=DEFAULT_TILE):
+    for y0 in range(0, height, tile):
+        for x0 in range(0, width, tile):
+            yield y0, min(height, y0 + tile), x0, min(width, x0 + tile)
+
+
+def processRegion(image, stages, y0, y1, x0, x1, halo=None):
+    # Result of the stages on the rows y0:y1 and columns x0:x1 of the image,
+    # computed from the region plus a halo so it is the same as the matching
+    # part of the result for the whole image
+    if halo is None:
+        halo = chainHalo(stages)
+    height, width = image.shape[:2]
+    top, left = max(0, y0 - halo), max(0, x0 - halo)
+    region = np.ascontiguousarray(image[top:min(height, y1 + halo), left:min(width, x1 + halo)])
+    for name, params in stages:
+        region = IMAGE_FILTERS[name](region, **params)
+    return region[y0 - top:y1 - top, x0 - left:x1 - left]
+
+
+def processTiled(image, stages, out=None, tile=DEFAULT_TILE, threads=None, onProgress=None):
+    # Applies the stages to an image (possibly memory mapped) tile by tile on
+    # `threads` threads, writing into `out` (allocated when None, its shape
+    # and dtype taken from the result of the first tile). cv2 releases the GIL
+    # while filtering, so the tiles run in parallel
+    height, width = image.shape[:2]
+    halo = chainHalo(stages)
+    tiles = list(tileGrid(height, width, tile))
+    first = processRegion(image, stages, *tiles[0], halo=halo)
+    if out is None:
+        out = np.empty((height, width) + first.shape[2:], dtype=first.dtype)
+    y0, y1, x0, x1 = tiles[0]
+    out[y0:y1, x0:x1] = first
+
+    def run(bounds):
+        y0, y1, x0, x1 = bounds
+        out[y0:y1, x0:x1] = processRegion(image, stages, y0, y1, x0, x1, halo)
+
+    with ThreadPoolExecutor(max_workers=threads or os.cpu_count() or 1) as pool:
+        for done, _ in enumerate(pool.map(run, tiles[1:]), 2):
+            if onProgress is not None:
+                onProgress(done / len(tiles))
+    return out
+
+
+def downscaleTiled(image, out=None, tile=DEFAULT_TILE):
+    # Half size copy of an image (area average), tile by tile
+    height, width = image.shape[:2]
+    if out is None:
+        out = np.empty(((height + 1) // 2, (width + 1) // 2) + image.shape[2:], dtype=image.dtype)
+    for y0, y1, x0, x1 in tileGrid(height, width, tile):
+        size = ((x1 - x0 + 1) // 2, (y1 - y0 + 1) // 2)
+        out[y0 // 2:y0 // 2 + size[1], x0 // 2:x0 // 2 + size[0]] = cv2.resize(
+            np.ascontiguousarray(image[y0:y1, x0:x1]), size, interpolation=cv2.INTER_AREA)
+    return out
+
+
+class ImagePyramid:
+    """An image and its successive half size copies, cached on disk"""
+
+    # Level n is the image downscaled by 2 ** n. Large levels are memory
+    # mapped from the cache, so showing part of an image only reads the
+    # pixels of the level matching the zoom. The levels are entries of the
+    # data cache, counted in its size and evicted like parsed data files
+
+    def __init__(self, levels):
+        self.levels = levels
+
+    @staticmethod
+    def entryDir(path, cache_dir=DEFAULT_CACHE_DIR):
+        name = 'image:' + os.path.abspath(path)
+        return os.path.join(cache_dir, hashlib.sha1(name.encode('utf-8')).hexdigest())
+
+    @classmethod
+    def cached(cls, path, cache_dir=DEFAULT_CACHE_DIR):
+        # The pyramid cached for this version of the file, or None
+        cache = DataCache(cache_dir)
+        entry = cls.entryDir(path, cache_dir)
+        meta = cache.readMeta(entry)
+        try:
+            if meta is None or meta.get('key') != fileKey(path):
+                return None
+        except OSError:
+            return None
+        meta['last_used'] = time.time()
+        cache.writeMeta(entry, meta)
+        return cls([np.load(os.path.join(entry, name), mmap_mode='r') for name in meta['levels']])
+
+    @classmethod
+    def open(cls, path, cache_dir=DEFAULT_CACHE_DIR, image=None, onProgress=None):
+        # Decodes the image once into the cache (unless it is given) and builds
+        # the levels there; later opens of the same file version only map the
+        # cached levels. .npy images are memory mapped instead of decoded
+        pyramid = cls.cached(path, cache_dir)
+        if pyramid is not None:
+            return pyramid
+
+        entry = cls.entryDir(path, cache_dir)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.makedirs(entry)
+        key = fileKey(path)
+        if image is None:
+            image = np.load(path, mmap_mode='r') if path.endswith('.npy') else loadImage(path)
+        names = []
+        levels = []
+        while True:
+            name = 'level{}.npy'.format(len(names))
+            stored = np.lib.format.open_memmap(os.path.join(entry, name), mode='w+',
+                                               dtype=image.dtype, shape=image.shape)
+            stored[...] = image
+            stored.flush()
+            del stored
+            names.append(name)
+            levels.append(np.load(os.path.join(entry, name), mmap_mode='r'))
+            if onProgress is not None:
+                onProgress(min(0.99, 1 - 0.5 ** (2 * len(names))))
+            if max(image.shape[:2]) <= PYRAMID_TOP_SIDE:
+                break
+            image = downscaleTiled(levels[-1])
+        cache = DataCache(cache_dir)
+        size = sum(os.path.getsize(os.path.join(entry, name)) for name in names)
+        cache.writeMeta(entry, {'key': key, 'levels': names, 'bytes': size,
+                                'last_used': time.time()})
+        cache.evict(keep=entry)
+        return cls(levels)
+
+    @property
+    def shape(self):
+        return self.levels[0].shape
+
+    def top(self):
+        return self.levels[-1]
+
+    def levelFor(self, pixels_per_screen_pixel):
+        # Finest level that still has about one pixel per screen pixel
+        level = int(np.floor(np.log2(max(1.0, pixels_per_screen_pixel))))
+        return min(level, len(self.levels) - 1)
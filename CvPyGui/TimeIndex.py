@@ -0,0 +1,108 @@
+import numpy as np
+
+from CvPyGui.Decimation import BASE_BUCKET, LEVEL_FACTOR, bucketCover
+
+# Rows converted to float64 at a time while building RegionSums
+SUM_CHUNK_ROWS = 1 << 20
+
+
+class TimeIndex:
+    """Maps time ranges of a series to row ranges by binary search"""
+
+    # The time stamps must be sorted, as the zeroed time of the data logger
+    # files is
+
+    def __init__(self, times):
+        self.times = np.asarray(times)
+
+    @classmethod
+    def fromSeries(cls, series):
+        return cls(series.index.to_numpy())
+
+    def __len__(self):
+        return len(self.times)
+
+    def rows(self, tmin, tmax):
+        # First and one past the last row with tmin <= time <= tmax
+        start = int(np.searchsorted(self.times, tmin, side='left'))
+        stop = int(np.searchsorted(self.times, tmax, side='right'))
+        return start, max(start, stop)
+
+    def slice(self, tmin, tmax):
+        return slice(*self.rows(tmin, tmax))
+
+    def nearest(self, t):
+        # Row whose time is the closest to t, or None for an empty series
+        if not len(self.times):
+            return None
+        position = int(np.searchsorted(self.times, t))
+        if position == len(self.times):
+            return position - 1
+        if position > 0 and t - self.times[position - 1] <= self.times[position] - t:
+            return position - 1
+        return position
+
+
+class RegionSums:
+    """Count, sum and sum of squares of the samples of each bucket, by level"""
+
+    # The buckets have the sizes of the MinMaxPyramid levels, so the sums of
+    # any range of rows add up a few buckets per level. Sums are taken
+    # relative to a reference value, to keep the variance accurate for
+    # signals with a large offset
+
+    def __init__(self, values, base=BASE_BUCKET, factor=LEVEL_FACTOR):
+        self.values = values
+        sample = values[:1000]
+        finite = sample[~np.isnan(sample)]
+        self.reference = float(finite.mean()) if len(finite) else 0.0
+
+        full = len(values) // base
+        level = np.empty((3, full))
+        for start in range(0, full * base, SUM_CHUNK_ROWS):
+            stop = min(full * base, start + SUM_CHUNK_ROWS)
+            count, total, squares = self.moments(values[start:stop])
+            for row, moment in enumerate((count, total, squares)):
+                level[row, start // base:stop // base] = moment.reshape(-1, base).sum(axis=1)
+        self.sizes = []
+        self.levels = []
+        size = base
+        while level.shape[1]:
+            self.sizes.append(size)
+            self.levels.append(level)
+            full = level.shape[1] // factor
+            level = level[:, :full * factor].reshape(3, full, factor).sum(axis=2)
+            size *= factor
+
+    def moments(self, values):
+        values = np.asarray(values, dtype=np.float64) - self.reference
+        valid = ~np.isnan(values)
+        values = np.where(valid, values, 0.0)
+        return valid.astype(np.float64), values, values * values
+
+    def __call__(self, start, stop):
+        # (count, sum, sum of squares) of the valid samples of rows [start, stop)
+        sums = np.zeros(3)
+        for level, first, last in bucketCover(start, stop, self.sizes):
+            if level < 0:
+                sums += [moment.sum() for moment in self.moments(self.values[first:last])]
+            else:
+                sums += self.levels[level][:, first:last].sum(axis=1)
+        return sums
+
+
+def regionStatistics(pyramid, sums, tmin, tmax):
+    # Statistics of the samples between tmin and tmax of a plotted series, from
+    # its pyramid (extremes) and RegionSums (moments): O(log n) for any range
+    start, stop = TimeIndex(pyramid.x).rows(tmin, tmax)
+    count, total, squares = sums(start, stop)
+    imin, imax = pyramid.extrema(start, stop)
+    if not count:
+        return dict(count=0, mean=np.nan, std=np.nan, min=np.nan, max=np.nan,
+                    time_of_min=np.nan, time_of_max=np.nan)
+    mean = total / count
+    return dict(count=int(count),
+                mean=sums.reference + mean,
+                std=np.sqrt(max(0.0, squares / count - mean * mean)),
+                min=float(pyramid.y[imin]), max=float(pyramid.y[imax]),
+                time_of_min=float(pyramid.x[imin]), time_of_max=float(pyramid.x[imax]))
@@ -0,0 +1,198 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from CvPyGui.ImagePipeline import IMAGE_FILTERS, drawContours
+from CvPyGui.Profiling import Timings
+
+
+def isCamera(source):
+    return isinstance(source, int) or str(source).isdigit()
+
+
+def openCapture(source):
+    # A camera index (0, '1'...) or a video file or stream URL
+    capture = cv2.VideoCapture(int(source) if isCamera(source) else source)
+    if not capture.isOpened():
+        raise IOError('Could not open the video source {}'.format(source))
+    return capture
+
+
+class LatestSlot:
+    """One element buffer where a put replaces the element not taken yet"""
+
+    # The bounded queue between the threads of a stream: a producer never
+    # waits for a slow consumer, the stale element is dropped instead
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.item = None
+        self.full = False
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        # True when the slot was empty, i.e. the consumer took the last element
+        with self.condition:
+            was_full = self.full
+            if was_full:
+                self.dropped += 1
+            self.item, self.full = item, True
+            self.condition.notify()
+            return not was_full
+
+    def take(self, timeout=None):
+        # Waits for an element. None once closed and empty, or on timeout
+        with self.condition:
+            while not self.full and not self.closed:
+                if not self.condition.wait(timeout):
+                    return None
+            return self.tryTakeLocked()
+
+    def tryTake(self):
+        with self.condition:
+            return self.tryTakeLocked()
+
+    def tryTakeLocked(self):
+        if not self.full:
+            return None
+        item, self.item, self.full = self.item, None, False
+        return item
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class VideoStream:
+    """Frames of a video file or camera run through a chain of image filters"""
+
+    # A capture thread reads the frames (at the frame rate of the file, or as
+    # the camera delivers them) into a one frame slot, and a processing thread
+    # filters the latest frame. When filtering is slower than the source the
+    # frames it had no time for are dropped instead of queued, so the shown
+    # frame is never more than one frame old. Results are handed to the
+    # consumer (the GUI) through a second slot the same way
+
+    def __init__(self, source, stages=(), contours=False, onResult=None, prepare=None,
+                 realtime=True, loop=False):
+        self.source = source
+        # Read once per frame by the processing thread; assign new lists to
+        # change them while the stream runs
+        self.stages = list(stages)
+        self.contours = contours
+        # Called on the processing thread when a result is ready in an empty
+        # slot, and once more when the stream ends
+        self.onResult = onResult
+        # Optional prepare(frame, result) run on the processing thread, whose
+        # return value is handed over with the frame (e.g. frames scaled for
+        # display)
+        self.prepare = prepare
+        self.realtime = realtime
+        self.loop = loop
+
+        self.capture = None
+        self.source_fps = 0.0
+        self.frames = LatestSlot()
+        self.results = LatestSlot()
+        self.timings = Timings()
+        self.captured = 0
+        self.processed = 0
+        self.processed_times = deque(maxlen=60)
+        self.stopping = threading.Event()
+        self.finished = False
+        self.threads = []
+
+    def start(self):
+        self.capture = openCapture(self.source)
+        self.source_fps = self.capture.get(cv2.CAP_PROP_FPS) or 0.0
+        self.threads = [threading.Thread(target=self.captureFrames, daemon=True),
+                        threading.Thread(target=self.processFrames, daemon=True)]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def captureFrames(self):
+        # Files are paced at their frame rate unless realtime is off (as fast
+        # as they decode); cameras block in read until the next frame
+        interval = 0.0
+        if self.realtime and self.source_fps > 0 and not isCamera(self.source):
+            interval = 1.0 / self.source_fps
+        next_frame = time.perf_counter()
+        while not self.stopping.is_set():
+            start = time.perf_counter()
+            ok, frame = self.capture.read()
+            if not ok:
+                if self.loop and self.captured and self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0):
+                    continue
+                break
+            captured_at = time.perf_counter()
+            self.timings.record('capture', captured_at - start)
+            self.captured += 1
+            self.frames.put((captured_at, frame))
+            if interval:
+                next_frame += interval
+                delay = next_frame - time.perf_counter()
+                if delay > 0:
+                    self.stopping.wait(delay)
+                else:
+                    next_frame = time.perf_counter()
+        self.frames.close()
+
+    def processFrames(self):
+        while True:
+            item = self.frames.take()
+            if item is None or self.stopping.is_set():
+                break
+            captured_at, frame = item
+            stages, contours = self.stages, self.contours
+            image = frame
+            for number, (name, params) in enumerate(stages, 1):
+                start = time.perf_counter()
+                image = IMAGE_FILTERS[name](image, **params)
+                self.timings.record('{}. {}'.format(number, name), time.perf_counter() - start)
+            if contours:
+                start = time.perf_counter()
+                image, _ = drawContours(image, frame)
+                self.timings.record('contours', time.perf_counter() - start)
+            prepared = None
+            if self.prepare is not None:
+                start = time.perf_counter()
+                prepared = self.prepare(frame, image)
+                self.timings.record('display', time.perf_counter() - start)
+            done = time.perf_counter()
+            # From the end of the read to the end of the filtering, waiting in
+            # the slot included
+            self.timings.record('latency', done - captured_at)
+            self.processed += 1
+            self.processed_times.append(done)
+            if self.results.put((frame, image, prepared)) and self.onResult is not None:
+                self.onResult()
+        self.finished = True
+        self.results.close()
+        if self.onResult is not None:
+            self.onResult()
+
+    def fps(self):
+        # Processed frames per second over the last frames
+        times = self.processed_times
+        if len(times) < 2 or times[-1] == times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def dropped(self):
+        # Frames read but never filtered, and filtered but never taken
+        return self.frames.dropped, self.results.dropped
+
+    def stop(self, timeout=2.0):
+        self.stopping.set()
+        self.frames.close()
+        self.results.close()
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+        if self.capture is not None:
+            self.capture.release()
@@ -0,0 +1,141 @@
+import logging
+import traceback
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from CvPyGui.Profiling import CAPTURE
+
+LOG = logging.getLogger('CvPyGui')
+
+
+def reportError(statusbar, summary, details=None):
+    # Failures are shown on the status bar (when there is one) and logged with
+    # their traceback, which goes to stderr unless logging is set up otherwise
+    if statusbar is not None:
+        statusbar.showMessage(summary)
+    if details:
+        LOG.error('%s\n%s', summary, details.rstrip())
+    else:
+        LOG.error('%s', summary)
+
+
+class JobSignals(QObject):
+    # Signals are emitted from the worker thread and delivered on the GUI thread
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+    progress = pyqtSignal(float)
+    partial = pyqtSignal(object)
+
+
+class Job(QRunnable):
+    """Cancellable unit of work run on the worker thread pool"""
+
+    def __init__(self, key, function, onCancel=None):
+        super().__init__()
+        self.key = key
+        self.function = function
+        self.onCancel = onCancel
+        self.cancelled = False
+        # Set once a thread picks the job up; from then on the pool may
+        # delete it at any time
+        self.started = False
+        self.signals = JobSignals()
+
+    def cancel(self):
+        self.cancelled = True
+        if self.onCancel is not None:
+            self.onCancel()
+
+    def reportProgress(self, fraction):
+        if not self.cancelled:
+            self.signals.progress.emit(fraction)
+
+    def reportPartial(self, result):
+        if not self.cancelled:
+            self.signals.partial.emit(result)
+
+    def run(self):
+        # The function receives the job, so it can report progress and check
+        # if it was cancelled while running
+        self.started = True
+        if self.cancelled:
+            return
+        try:
+            with CAPTURE.thread():
+                result = self.function(self)
+        except Exception:
+            if not self.cancelled:
+                self.signals.error.emit(traceback.format_exc())
+            return
+        if not self.cancelled:
+            self.signals.finished.emit(result)
+
+
+class WorkerPool(QObject):
+    """Runs jobs off the GUI thread, keeping only the latest job for each key"""
+
+    def __init__(self, parent=None, max_threads=None):
+        super().__init__(parent)
+        self.pool = QThreadPool()
+        if max_threads is not None:
+            self.pool.setMaxThreadCount(max_threads)
+        self.jobs = {}
+
+    def submit(self, key, function, onResult=None, onError=None,
+               onProgress=None, onPartial=None, onCancel=None):
+        # Submitting a job supersedes the one still pending or running with the
+        # same key: it is cancelled and its results are never delivered
+        self.cancel(key)
+
+        job = Job(key, function, onCancel)
+        job.signals.finished.connect(lambda result: self.jobFinished(job, result, onResult))
+        job.signals.error.connect(lambda message: self.jobFailed(job, message, onError))
+        if onProgress is not None:
+            job.signals.progress.connect(lambda fraction: self.isCurrent(job) and onProgress(fraction))
+        if onPartial is not None:
+            job.signals.partial.connect(lambda result: self.isCurrent(job) and onPartial(result))
+
+        self.jobs[key] = job
+        self.pool.start(job)
+        return job
+
+    def cancel(self, key):
+        job = self.jobs.pop(key, None)
+        if job is not None:
+            job.cancel()
+            if job.started:
+                # Running or done: the cancelled flag stops it, and a job the
+                # pool already ran has been deleted, so it can not be taken
+                return
+            try:
+                self.pool.tryTake(job)
+            except RuntimeError:
+                # It started and finished since the check above
+                pass
+
+    def cancelAll(self):
+        for key in list(self.jobs):
+            self.cancel(key)
+        self.pool.waitForDone()
+
+    def isCurrent(self, job):
+        return self.jobs.get(job.key) is job
+
+    def isBusy(self, key):
+        return key in self.jobs
+
+    def jobFinished(self, job, result, onResult):
+        if not self.isCurrent(job):
+            return
+        del self.jobs[job.key]
+        if onResult is not None:
+            onResult(result)
+
+    def jobFailed(self, job, message, onError):
+        if not self.isCurrent(job):
+            return
+        del self.jobs[job.key]
+        if onError is not None:
+            onError(message)
+        else:
+            reportError(None, 'Job {!r} failed'.format(job.key), message)
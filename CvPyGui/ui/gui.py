@@ -94,6 +94,12 @@ class Ui_MainWindow(object):
         self.actionSave_original_image.setObjectName("actionSave_original_image")
         self.actionSave_processed_image = QtWidgets.QAction(MainWindow)
         self.actionSave_processed_image.setObjectName("actionSave_processed_image")
+        self.actionOpen_video = QtWidgets.QAction(MainWindow)
+        self.actionOpen_video.setObjectName("actionOpen_video")
+        self.actionOpen_camera = QtWidgets.QAction(MainWindow)
+        self.actionOpen_camera.setObjectName("actionOpen_camera")
+        self.actionStop_video = QtWidgets.QAction(MainWindow)
+        self.actionStop_video.setObjectName("actionStop_video")
         self.actionExit = QtWidgets.QAction(MainWindow)
         self.actionExit.setObjectName("actionExit")
         self.actionLicense = QtWidgets.QAction(MainWindow)
@@ -101,6 +107,9 @@ class Ui_MainWindow(object):
         self.actionAbout = QtWidgets.QAction(MainWindow)
         self.actionAbout.setObjectName("actionAbout")
         self.menuFile.addAction(self.actionOpen_image)
+        self.menuFile.addAction(self.actionOpen_video)
+        self.menuFile.addAction(self.actionOpen_camera)
+        self.menuFile.addAction(self.actionStop_video)
         self.menuFile.addSeparator()
         self.menuFile.addAction(self.actionSave_original_image)
         self.menuFile.addAction(self.actionSave_processed_image)
@@ -126,6 +135,9 @@ class Ui_MainWindow(object):
         self.menuFile.setTitle(_translate("MainWindow", "File"))
         self.menuHelp.setTitle(_translate("MainWindow", "Help"))
         self.actionOpen_image.setText(_translate("MainWindow", "Open image"))
+        self.actionOpen_video.setText(_translate("MainWindow", "Open video"))
+        self.actionOpen_camera.setText(_translate("MainWindow", "Open camera"))
+        self.actionStop_video.setText(_translate("MainWindow", "Stop video"))
         self.actionSave_original_image.setText(_translate("MainWindow", "Save original image"))
         self.actionSave_processed_image.setText(_translate("MainWindow", "Save processed image"))
         self.actionExit.setText(_translate("MainWindow", "Exit"))
@@ -7,7 +7,7 @@
 # WARNING! All changes made in this file will be lost!
 
 from PyQt5 import QtCore, QtGui, QtWidgets
-from ..PlotContainer import SinglePlotContainer
+from ..PlotManager import PlotManager
 
 class Ui_MainWindow(object):
     def setupUi(self, MainWindow):
@@ -24,15 +24,20 @@ class Ui_MainWindow(object):
         self.mainVLayout.addLayout(self.bottomCommandsHLayout)
         self.mainVLayout.addLayout(self.plotsVLayout)
 
-        self.plot1 = SinglePlotContainer()
+        self.addPlotButton = QtWidgets.QPushButton(self.centralwidget)
+        self.addPlotButton.setObjectName("addPlotButton")
+        self.bottomCommandsHLayout.addWidget(self.addPlotButton)
+        self.bottomCommandsHLayout.addStretch(1)
+
+        self.plotManager = PlotManager(self.centralwidget)
+        self.plotManager.setObjectName("plotManager")
+        self.plotsVLayout.addWidget(self.plotManager)
+        self.plot1 = self.plotManager.addPlot()
         self.plot1.setObjectName("plot1")
-        self.plotsVLayout.addWidget(self.plot1)
-        self.plot2 = SinglePlotContainer()
+        self.plot2 = self.plotManager.addPlot()
         self.plot2.setObjectName("plot2")
-        self.plotsVLayout.addWidget(self.plot2)
-        self.plot3 = SinglePlotContainer()
+        self.plot3 = self.plotManager.addPlot()
         self.plot3.setObjectName("plot3")
-        self.plotsVLayout.addWidget(self.plot3)
 
         self.menubar = QtWidgets.QMenuBar(MainWindow)
         self.menubar.setGeometry(QtCore.QRect(0, 0, 1053, 23))
@@ -46,16 +51,66 @@ class Ui_MainWindow(object):
         self.statusbar.setObjectName("statusbar")
         self.actionLoad_data = QtWidgets.QAction(MainWindow)
         self.actionLoad_data.setObjectName("actionLoad_data")
+        self.actionCompare_file = QtWidgets.QAction(MainWindow)
+        self.actionCompare_file.setObjectName("actionCompare_file")
+        self.actionClose_compared = QtWidgets.QAction(MainWindow)
+        self.actionClose_compared.setObjectName("actionClose_compared")
+        self.actionFollow_file = QtWidgets.QAction(MainWindow)
+        self.actionFollow_file.setCheckable(True)
+        self.actionFollow_file.setObjectName("actionFollow_file")
+        self.actionImage_workspace = QtWidgets.QAction(MainWindow)
+        self.actionImage_workspace.setObjectName("actionImage_workspace")
+        self.actionFilter_all = QtWidgets.QAction(MainWindow)
+        self.actionFilter_all.setObjectName("actionFilter_all")
+        self.actionExport_plots = QtWidgets.QAction(MainWindow)
+        self.actionExport_plots.setObjectName("actionExport_plots")
+        self.actionExport_channels = QtWidgets.QAction(MainWindow)
+        self.actionExport_channels.setObjectName("actionExport_channels")
+        self.actionOpen_session = QtWidgets.QAction(MainWindow)
+        self.actionOpen_session.setObjectName("actionOpen_session")
+        self.actionSave_session = QtWidgets.QAction(MainWindow)
+        self.actionSave_session.setObjectName("actionSave_session")
+        self.actionLean_mode = QtWidgets.QAction(MainWindow)
+        self.actionLean_mode.setCheckable(True)
+        self.actionLean_mode.setObjectName("actionLean_mode")
+        self.actionSingle_precision = QtWidgets.QAction(MainWindow)
+        self.actionSingle_precision.setCheckable(True)
+        self.actionSingle_precision.setChecked(True)
+        self.actionSingle_precision.setObjectName("actionSingle_precision")
+        self.actionClear_cache = QtWidgets.QAction(MainWindow)
+        self.actionClear_cache.setObjectName("actionClear_cache")
         self.actionExit = QtWidgets.QAction(MainWindow)
         self.actionExit.setObjectName("actionExit")
         self.actionLicense = QtWidgets.QAction(MainWindow)
         self.actionLicense.setObjectName("actionLicense")
         self.actionAbout = QtWidgets.QAction(MainWindow)
         self.actionAbout.setObjectName("actionAbout")
+        self.actionShow_timings = QtWidgets.QAction(MainWindow)
+        self.actionShow_timings.setCheckable(True)
+        self.actionShow_timings.setObjectName("actionShow_timings")
+        self.actionProfile = QtWidgets.QAction(MainWindow)
+        self.actionProfile.setCheckable(True)
+        self.actionProfile.setObjectName("actionProfile")
         self.menuFile.addAction(self.actionLoad_data)
+        self.menuFile.addAction(self.actionCompare_file)
+        self.menuFile.addAction(self.actionClose_compared)
+        self.menuFile.addAction(self.actionFollow_file)
+        self.menuFile.addAction(self.actionFilter_all)
+        self.menuFile.addAction(self.actionImage_workspace)
+        self.menuFile.addSeparator()
+        self.menuFile.addAction(self.actionExport_plots)
+        self.menuFile.addAction(self.actionExport_channels)
+        self.menuFile.addAction(self.actionOpen_session)
+        self.menuFile.addAction(self.actionSave_session)
         self.menuFile.addSeparator()
+        self.menuFile.addAction(self.actionLean_mode)
+        self.menuFile.addAction(self.actionSingle_precision)
+        self.menuFile.addAction(self.actionClear_cache)
         self.menuFile.addSeparator()
         self.menuFile.addAction(self.actionExit)
+        self.menuHelp.addAction(self.actionShow_timings)
+        self.menuHelp.addAction(self.actionProfile)
+        self.menuHelp.addSeparator()
         self.menuHelp.addAction(self.actionLicense)
         self.menuHelp.addAction(self.actionAbout)
         self.menubar.addAction(self.menuFile.menuAction())
@@ -72,12 +127,27 @@ class Ui_MainWindow(object):
         _translate = QtCore.QCoreApplication.translate
         MainWindow.setWindowTitle(_translate("MainWindow", "Data Analysis"))
 
+        self.addPlotButton.setText(_translate("MainWindow", "Add plot"))
         self.menuFile.setTitle(_translate("MainWindow", "File"))
         self.menuHelp.setTitle(_translate("MainWindow", "Help"))
         self.actionLoad_data.setText(_translate("MainWindow", "Load data"))
+        self.actionCompare_file.setText(_translate("MainWindow", "Compare with data file"))
+        self.actionClose_compared.setText(_translate("MainWindow", "Close compared files"))
+        self.actionFollow_file.setText(_translate("MainWindow", "Follow file"))
+        self.actionFilter_all.setText(_translate("MainWindow", "Filter all channels"))
+        self.actionImage_workspace.setText(_translate("MainWindow", "Image processing"))
+        self.actionExport_plots.setText(_translate("MainWindow", "Export plot data"))
+        self.actionExport_channels.setText(_translate("MainWindow", "Export filtered channels"))
+        self.actionOpen_session.setText(_translate("MainWindow", "Open session"))
+        self.actionSave_session.setText(_translate("MainWindow", "Save session"))
+        self.actionLean_mode.setText(_translate("MainWindow", "Memory-lean mode"))
+        self.actionSingle_precision.setText(_translate("MainWindow", "Single precision (float32)"))
+        self.actionClear_cache.setText(_translate("MainWindow", "Clear data cache"))
         self.actionExit.setText(_translate("MainWindow", "Exit"))
         self.actionLicense.setText(_translate("MainWindow", "License"))
         self.actionAbout.setText(_translate("MainWindow", "About"))
+        self.actionShow_timings.setText(_translate("MainWindow", "Show timings"))
+        self.actionProfile.setText(_translate("MainWindow", "Profile (cProfile)"))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from PyQt5.QtCore import QSize, Qt
+from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtWidgets import QApplication
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CvPyGui.FrameDisplay import FrameAdapter
+
+
+def best(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Showing a frame in a label: GUI thread time of scaling the pixmap there '
+                    'against a display frame prepared on a worker')
+    parser.add_argument('--sources', nargs='+', default=['640x480', '1920x1080', '4000x3000'],
+                        help='frame sizes, as WIDTHxHEIGHT')
+    parser.add_argument('--label', default='600x500', help='label size, as WIDTHxHEIGHT')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    label = QSize(*(int(side) for side in args.label.split('x')))
+    adapter = FrameAdapter()
+    print('{:<11} {:>12} {:>11} {:>12} {:>8}'.format(
+        'source', 'GUI scale ms', 'prepare ms', 'GUI show ms', 'buffers'))
+    for source in args.sources:
+        width, height = (int(side) for side in source.split('x'))
+        frame = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+
+        def guiScaled():
+            # The former path: convert and smooth scale the whole frame on
+            # the GUI thread
+            image = QImage(frame.data, width, height, frame.strides[0], QImage.Format_BGR888)
+            QPixmap.fromImage(image).scaled(label, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+        # Like a stream, only the last frame is kept, so the pool reuses the
+        # buffers of the previous ones
+        prepared = [None]
+        scaled_time = best(guiScaled, args.repeat)
+
+        def prepare():
+            prepared[0] = adapter.prepare(frame, (label.width(), label.height()))
+
+        prepare_time = best(prepare, args.repeat)
+        show_time = best(lambda: prepared[0].pixmap(), args.repeat)
+        print('{:<11} {:>12.2f} {:>11.2f} {:>12.2f} {:>8}'.format(
+            source, scaled_time * 1000, prepare_time * 1000, show_time * 1000,
+            adapter.pool.allocated))
+    app.quit()
+
+
+if __name__ == '__main__':
+    main()
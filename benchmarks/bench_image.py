@@ -0,0 +1,87 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CvPyGui.FilterPipeline import FilterPipeline
+from CvPyGui.ImagePipeline import (IMAGE_FILTERS, downscale, drawContours, loadImage,
+                                   previewImageStages, previewScale)
+from CvPyGui.Tiles import processTiled
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          'resources', 'Test Images')
+
+# Blur, threshold and morphology, as a typical chain of the image workspace
+CHAIN = [('Gaussian blur', {'k': 9}), ('Threshold', {'k': 127}),
+         ('Opening', {'k': 7}), ('Closing', {'k': 7})]
+
+
+def best(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def runChain(pipeline, stages, original):
+    image, _ = pipeline.run(stages)
+    return drawContours(image, original)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Image workspace chain: full resolution, drag preview, cached reruns and tiles')
+    parser.add_argument('images', nargs='*', help='images (the test images by default)')
+    parser.add_argument('--upscale', type=float, nargs='+', default=[1, 4],
+                        help='also time the images enlarged by these factors')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=None,
+                        help='threads of the tiled run (one per core by default)')
+    args = parser.parse_args()
+
+    paths = args.images or sorted(glob.glob(os.path.join(IMAGES_DIR, '*.jpg')))
+    print('{:<24} {:>11} {:>9} {:>10} {:>12} {:>8}'.format(
+        'image', 'size', 'full s', 'preview s', 'last stage s', 'tiled s'))
+    for path in paths:
+        source = loadImage(path)
+        for factor in args.upscale:
+            image = source if factor == 1 else cv2.resize(source, None, fx=factor, fy=factor)
+            scale = previewScale(image.shape)
+            preview = downscale(image, scale)
+            preview_stages = previewImageStages(CHAIN, scale)
+
+            def full():
+                pipeline = FilterPipeline(filters=IMAGE_FILTERS)
+                pipeline.setRaw(image)
+                return runChain(pipeline, CHAIN, image)
+
+            def dragPreview():
+                pipeline = FilterPipeline(filters=IMAGE_FILTERS)
+                pipeline.setRaw(preview)
+                return runChain(pipeline, preview_stages, preview)
+
+            # Moving the last slider reruns only the last stage
+            cached = FilterPipeline(filters=IMAGE_FILTERS)
+            cached.setRaw(image)
+            runChain(cached, CHAIN, image)
+            changed = CHAIN[:-1] + [('Closing', {'k': 9})]
+
+            full_time, _ = best(full, args.repeat)
+            preview_time, _ = best(dragPreview, args.repeat)
+            last_time, _ = best(lambda: runChain(cached, changed, image), args.repeat)
+            # The chain alone (no contours) over tiles on all cores
+            tiled_time, _ = best(lambda: processTiled(image, CHAIN, threads=args.threads), args.repeat)
+            print('{:<24} {:>11} {:>9.3f} {:>10.4f} {:>12.4f} {:>8.3f}'.format(
+                os.path.basename(path)[:24], '{}x{}'.format(image.shape[1], image.shape[0]),
+                full_time, preview_time, last_time, tiled_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CvPyGui import RollingStats
+
+
+def pandasMedian(values, k):
+    # The path Filter.process used before the rolling statistics engine
+    series = pd.Series(values)
+    return series.rolling(window=int(k), center=True).median().ffill().bfill()
+
+
+def best(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rolling median: engine vs pandas')
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000, 10000000])
+    parser.add_argument('--windows', type=int, nargs='+', default=[5, 31, 301])
+    parser.add_argument('--columns', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print('backend: {}'.format('bottleneck' if RollingStats.bn is not None else 'pandas'))
+    print('{:>10} {:>6} {:>10} {:>10} {:>8}'.format('rows', 'k', 'pandas s', 'engine s', 'speedup'))
+    rng = np.random.default_rng(0)
+    for rows in args.rows:
+        values = rng.standard_normal((rows, args.columns)).astype(np.float32)
+        values[rng.integers(0, rows, rows // 1000)] = np.nan
+        for k in args.windows:
+            reference_time = 0.0
+            for column in range(args.columns):
+                elapsed, reference = best(lambda: pandasMedian(values[:, column], k), args.repeat)
+                reference_time += elapsed
+            engine_time, result = best(lambda: RollingStats.rollingMedian(values, k), args.repeat)
+            assert np.allclose(result[:, -1], reference, equal_nan=True)
+            print('{:>10} {:>6} {:>10.3f} {:>10.3f} {:>7.1f}x'.format(
+                rows, k, reference_time, engine_time, reference_time / engine_time))
+
+
+if __name__ == '__main__':
+    main()
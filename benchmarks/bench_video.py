@@ -0,0 +1,62 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_image import CHAIN
+from synthetic import writeVideoFile
+
+from CvPyGui.VideoStream import VideoStream
+
+
+def play(path, realtime, contours):
+    # Runs a whole video through the stream, taking every result like the GUI
+    done = threading.Event()
+    stream = VideoStream(path, CHAIN, contours, realtime=realtime)
+
+    def take():
+        stream.results.tryTake()
+        if stream.finished:
+            done.set()
+
+    stream.onResult = take
+    stream.start()
+    done.wait()
+    stream.stop()
+    return stream
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Video stream: frame rate, dropped frames and stage latencies on synthetic videos')
+    parser.add_argument('--sizes', nargs='+', default=['640x480', '1280x720', '1920x1080'],
+                        help='frame sizes, as WIDTHxHEIGHT')
+    parser.add_argument('--frames', type=int, default=150)
+    parser.add_argument('--fps', type=float, default=30.0, help='frame rate of the videos')
+    parser.add_argument('--no-contours', action='store_true')
+    args = parser.parse_args()
+
+    print('{:<10} {:<9} {:>7} {:>8} {:>8} {:>11}  {}'.format(
+        'size', 'pacing', 'fps', 'frames', 'dropped', 'latency ms', 'stages (mean ms)'))
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            width, height = (int(side) for side in size.split('x'))
+            path = os.path.join(directory, '{}.avi'.format(size))
+            writeVideoFile(path, args.frames, width, height, args.fps)
+            # Paced at the frame rate of the file, like the workspace, and as
+            # fast as the frames decode
+            for realtime in (True, False):
+                stream = play(path, realtime, not args.no_contours)
+                timings = {name: mean for name, last, mean, worst, runs in stream.timings.summary()}
+                latency = timings.pop('latency', 0.0)
+                print('{:<10} {:<9} {:>7.1f} {:>8} {:>8} {:>11.1f}  {}'.format(
+                    size, 'realtime' if realtime else 'unpaced', stream.fps(), stream.captured,
+                    stream.dropped()[0], latency * 1000,
+                    ', '.join('{} {:.1f}'.format(name, mean * 1000) for name, mean in timings.items())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+DEFAULT_ROWS = [10000, 100000, 1000000, 10000000]
+
+
+def peakRss():
+    # Peak resident set size of this process so far, in MB
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def timed(results, name, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    results[name] = {'seconds': time.perf_counter() - start, 'peak_rss_mb': peakRss()}
+    return result
+
+
+def runCase(path, rows, channels):
+    # Runs in a fresh process so the peak RSS belongs to this case only
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    import matplotlib
+    matplotlib.use('Agg')
+    import numpy as np
+    from PyQt5.QtWidgets import QApplication
+
+    from CvPyGui import Main
+    from CvPyGui.DataLoader import ChunkedLoader, TIME_COLUMN
+    from CvPyGui.FilterPipeline import FILTERS, applyStagesToColumns
+
+    results = {}
+    loader = ChunkedLoader(path)
+    df = timed(results, 'parse', loader.load)
+    timed(results, 'time_zeroing', lambda: df[TIME_COLUMN].to_numpy() - df[TIME_COLUMN].iloc[0])
+
+    app = QApplication.instance() or QApplication([])
+    window = Main.MyApp()
+    window.resize(1300, 800)
+    window.show()
+    app.processEvents()
+    window.path = path
+    window.original_df = df
+    window.showFirstChunk(df)
+
+    plot = window.plot1
+    variable = list(df)[1]
+    plot.pipeline.setRaw(df[variable])
+    timed(results, 'plot', lambda: (plot.setData(*plot.runPipeline([])), plot.plot(), plot.canvas.draw()))
+
+    for name in FILTERS:
+        stages = [(name, {'k': 31})]
+        result = timed(results, 'filter[{}]'.format(name), plot.runPipeline, stages)
+        timed(results, 'updatePlot[{}]'.format(name), lambda: (plot.setData(*result), plot.updatePlot()))
+        timed(results, 'filter_cached[{}]'.format(name), plot.runPipeline, stages)
+        columns = [column for column in df if column != TIME_COLUMN]
+        timed(results, 'filter_all_channels[{}]'.format(name), applyStagesToColumns, df, stages, columns)
+
+    window.workers.cancelAll()
+    return {'rows': rows, 'channels': channels, 'file_mb': os.path.getsize(path) / 1e6,
+            'timings': results, 'peak_rss_mb': peakRss()}
+
+
+def gitVersion():
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'],
+                                       cwd=BENCHMARKS_DIR, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless benchmarks of the load, filter and render paths')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS,
+                        help='sizes of the synthetic files (up to 100000000)')
+    parser.add_argument('--channels', type=int, default=8)
+    parser.add_argument('--data-dir', default=None,
+                        help='where synthetic files are kept between runs')
+    parser.add_argument('--output', default='bench_output.json')
+    args = parser.parse_args()
+
+    from synthetic import writeLoggerFile
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='cvpygui-bench-')
+    os.makedirs(data_dir, exist_ok=True)
+    context = multiprocessing.get_context('spawn')
+    cases = []
+    for rows in args.rows:
+        path = os.path.join(data_dir, 'logger_{}x{}.txt'.format(rows, args.channels))
+        if not os.path.exists(path):
+            print('writing {}'.format(path))
+            writeLoggerFile(path, rows, args.channels)
+        with context.Pool(1) as pool:
+            case = pool.apply(runCase, (path, rows, args.channels))
+        cases.append(case)
+        for name, timing in case['timings'].items():
+            print('{:>10} {:<32} {:>9.4f} s {:>9.1f} MB'.format(
+                rows, name, timing['seconds'], timing['peak_rss_mb']))
+
+    report = {'version': gitVersion(), 'python': platform.python_version(),
+              'platform': platform.platform(), 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'cases': cases}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('results written to {}'.format(args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+HEADER_LINES = 6
+WRITE_CHUNK = 1000000
+
+
+def writeLoggerFile(path, rows, channels=8, rate=100.0, seed=0):
+    # Writes a file in the layout MyApp.LoadDataFile reads: six header lines,
+    # the column names, a line of units and tab separated rows. Some samples
+    # are 'NaN' or 'OutOfRange', as written by the logger
+    rng = np.random.default_rng(seed)
+    names = ['Tempo'] + ['Canal {}'.format(number) for number in range(1, channels + 1)]
+    with open(path, 'w') as f:
+        for line in range(HEADER_LINES):
+            f.write('Logger header line {}\n'.format(line + 1))
+        f.write('\t'.join(names) + '\n')
+        f.write('\t'.join(['s'] + ['V'] * channels) + '\n')
+
+        level = np.zeros(channels)
+        for start in range(0, rows, WRITE_CHUNK):
+            count = min(WRITE_CHUNK, rows - start)
+            time = 3600.0 + (start + np.arange(count)) / rate
+            data = level + rng.standard_normal((count, channels)).cumsum(axis=0) * 0.01
+            level = data[-1]
+            chunk = pd.DataFrame(data, columns=names[1:])
+            chunk.insert(0, 'Tempo', time)
+            chunk = chunk.round(5).astype(object)
+            for marker in ('NaN', 'OutOfRange'):
+                holes = rng.integers(0, count, max(1, count // 10000))
+                chunk.iloc[holes, rng.integers(1, channels + 1)] = marker
+            chunk.to_csv(f, sep='\t', header=False, index=False)
+    return names
+
+
+def writeVideoFile(path, frames, width=640, height=480, fps=30.0, seed=0):
+    # Writes an MJPG video of bright discs drifting over a noisy background,
+    # which the image workspace can threshold and outline like the test images
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    if not writer.isOpened():
+        raise IOError('Could not write the video {}'.format(path))
+    discs = rng.uniform(0, 1, (12, 2)) * (width, height)
+    speeds = rng.uniform(-4, 4, (12, 2))
+    radii = rng.integers(10, max(11, min(width, height) // 8), 12)
+    for _ in range(frames):
+        frame = rng.integers(0, 60, (height, width, 3), dtype=np.uint8)
+        discs = (discs + speeds) % (width, height)
+        for (x, y), radius in zip(discs, radii):
+            cv2.circle(frame, (int(x), int(y)), int(radius), (200, 220, 240), -1)
+        writer.write(frame)
+    writer.release()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a synthetic data logger file')
+    parser.add_argument('path')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('--channels', type=int, default=8)
+    args = parser.parse_args()
+    writeLoggerFile(args.path, args.rows, args.channels)
@@ -1,9 +1,28 @@
 if __name__ == '__main__':
     import sys
+    import time
+    started = time.perf_counter()
+
+    # --startup-report prints the imports (like python -X importtime) and the
+    # time of each phase until the window is shown
+    report = None
+    if '--startup-report' in sys.argv:
+        sys.argv.remove('--startup-report')
+        from CvPyGui.Startup import StartupReport
+        report = StartupReport(started)
+
+    from PyQt5.QtCore import QTimer
     from PyQt5.QtWidgets import QApplication
     from CvPyGui import Main
+    if report is not None:
+        report.mark('imports')
 
     app = QApplication(sys.argv)
+    if report is not None:
+        report.mark('QApplication')
     window = Main.MyApp()
+    if report is not None:
+        report.mark('window created')
+        QTimer.singleShot(0, report.finish)
     window.show()
     sys.exit(app.exec_())